@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dataset, Equipment
+from .models import Anomaly, Dataset, Equipment, Job
 
 
 @admin.register(Dataset)
@@ -14,3 +14,17 @@ class EquipmentAdmin(admin.ModelAdmin):
     list_display = ('equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature', 'dataset')
     list_filter = ('equipment_type', 'dataset')
     search_fields = ('equipment_name', 'equipment_type')
+
+
+@admin.register(Anomaly)
+class AnomalyAdmin(admin.ModelAdmin):
+    list_display = ('equipment_name', 'equipment_type', 'parameter', 'value', 'zscore', 'by_zscore', 'by_iqr', 'dataset')
+    list_filter = ('parameter', 'by_zscore', 'by_iqr')
+    search_fields = ('equipment_name', 'equipment_type')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'state', 'user', 'dataset', 'rows_processed', 'created_at', 'finished_at')
+    list_filter = ('kind', 'state')
+    search_fields = ('user__username', 'error')
@@ -0,0 +1,199 @@
+from itertools import groupby
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset
+from .bulk import insert_anomalies
+from .columnar import ColumnStore, NUMERIC_COLUMNS
+from .sketches import DatasetSketch
+from .statistics import equipment_frame, get_statistics
+
+
+METHODS = ['zscore', 'iqr']
+
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def exact_bounds(columns, type_codes, groups):
+    """Per type code: row count, mean, std and quartiles of every parameter, as arrays indexed by code"""
+    frame = pd.DataFrame({column: np.asarray(columns[column]) for column in NUMERIC_COLUMNS})
+    grouped = frame.groupby(np.asarray(type_codes))
+    index = np.arange(groups)
+    count = grouped.size().reindex(index, fill_value=0).to_numpy()
+    mean = grouped.mean().reindex(index)
+    std = grouped.std().reindex(index)
+    q1 = grouped.quantile(0.25).reindex(index)
+    q3 = grouped.quantile(0.75).reindex(index)
+    return {
+        column: {
+            'count': count,
+            'mean': mean[column].to_numpy(),
+            'std': std[column].to_numpy(),
+            'q1': q1[column].to_numpy(),
+            'q3': q3[column].to_numpy(),
+        }
+        for column in NUMERIC_COLUMNS
+    }
+
+
+def sketch_bounds(statistics, sketch, types):
+    """The same arrays from the stored per-type moments, with quartiles read off the upload's sketches.
+
+    Types past SKETCH_MAX_TYPES have no sketches of their own, so only the z-score rule applies to them.
+    """
+    by_type = {entry['equipment_type']: entry for entry in statistics['by_type']}
+    count = np.zeros(len(types), dtype=np.int64)
+    bounds = {
+        column: {'count': count, **{field: np.full(len(types), np.nan) for field in ('mean', 'std', 'q1', 'q3')}}
+        for column in NUMERIC_COLUMNS
+    }
+    for code, equipment_type in enumerate(types):
+        entry = by_type.get(equipment_type)
+        if entry is None:
+            continue
+        count[code] = entry['count']
+        sketches = sketch.by_type.get(equipment_type)
+        for column in NUMERIC_COLUMNS:
+            bounds[column]['mean'][code] = _float(entry[column]['mean'])
+            bounds[column]['std'][code] = _float(entry[column]['std'])
+            if sketches:
+                bounds[column]['q1'][code], bounds[column]['q3'][code] = sketches[column].quantiles([0.25, 0.75])
+    return bounds
+
+
+def flag_values(values, type_codes, bounds, zscore_threshold, iqr_multiplier, min_group_size):
+    """(zscore, by_zscore, by_iqr) arrays for one parameter; rows of types without bounds are never flagged"""
+    checked = bounds['count'][type_codes] >= min_group_size
+    std = bounds['std'][type_codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = np.where(std > 0, (values - bounds['mean'][type_codes]) / std, np.nan)
+    spread = iqr_multiplier * (bounds['q3'] - bounds['q1'])
+    low = (bounds['q1'] - spread)[type_codes]
+    high = (bounds['q3'] + spread)[type_codes]
+    by_zscore = checked & (np.abs(zscore) > zscore_threshold)
+    by_iqr = checked & ((values < low) | (values > high))
+    return zscore, by_zscore, by_iqr
+
+
+def store_blocks(store, block_size):
+    """(start, type codes, {column: values}) for consecutive blocks of a column store"""
+    for start in range(0, store.rows, block_size):
+        stop = min(start + block_size, store.rows)
+        columns = {column: np.asarray(store.column(column)[start:stop]) for column in NUMERIC_COLUMNS}
+        yield start, np.asarray(store.type_codes[start:stop], dtype=np.int64), columns
+
+
+def find_anomalies(blocks, types, bounds, names_at):
+    """Yield a DataFrame of Anomaly fields (bulk.ANOMALY_COLUMNS) per block, in row order"""
+    zscore_threshold = settings.ANOMALY_ZSCORE_THRESHOLD
+    iqr_multiplier = settings.ANOMALY_IQR_MULTIPLIER
+    min_group_size = settings.ANOMALY_MIN_GROUP_SIZE
+    types = np.asarray(types, dtype=object)
+
+    for start, type_codes, columns in blocks:
+        flagged = []
+        for order, column in enumerate(NUMERIC_COLUMNS):
+            values = columns[column]
+            zscore, by_zscore, by_iqr = flag_values(
+                values, type_codes, bounds[column], zscore_threshold, iqr_multiplier, min_group_size
+            )
+            hits = np.flatnonzero(by_zscore | by_iqr)
+            flagged.append(pd.DataFrame({
+                'row': start + hits + 1,
+                'order': order,
+                'equipment_type': types[type_codes[hits]],
+                'parameter': column,
+                'value': values[hits],
+                'zscore': np.where(np.isfinite(zscore[hits]), zscore[hits], np.nan),
+                'by_zscore': by_zscore[hits],
+                'by_iqr': by_iqr[hits],
+            }))
+        block = pd.concat(flagged, ignore_index=True).sort_values(['row', 'order'])
+        if block.empty:
+            continue
+        block['equipment_name'] = names_at(block['row'].to_numpy() - 1)
+        yield block
+
+
+def detect_anomalies(dataset, store=None, statistics=None, sketch=None):
+    """Flag per-type outliers of every parameter, replace the dataset's stored anomalies and return their count.
+
+    A value is flagged when its z-score within its equipment type exceeds
+    ANOMALY_ZSCORE_THRESHOLD or it lies more than ANOMALY_IQR_MULTIPLIER
+    interquartile ranges outside the type's quartiles. Up to
+    EXACT_STATISTICS_MAX_ROWS rows the per-type figures are exact; bigger
+    stores take them from the stored statistics and sketches, so rows are
+    only read block by block.
+    """
+    store = store if store is not None else ColumnStore.for_dataset(dataset)
+    dataset.anomalies.all().delete()
+
+    if store is not None:
+        if not store.rows:
+            return 0
+        if store.rows > settings.EXACT_STATISTICS_MAX_ROWS:
+            statistics = statistics or get_statistics(dataset)
+            sketch = sketch or DatasetSketch.from_dict(dataset.sketches)
+            bounds = sketch_bounds(statistics, sketch, store.types)
+        else:
+            columns = {column: store.column(column) for column in NUMERIC_COLUMNS}
+            bounds = exact_bounds(columns, store.type_codes, len(store.types))
+        blocks = store_blocks(store, settings.INGEST_CHUNK_SIZE)
+        types = store.types
+        names_at = store.names_at
+    else:
+        frame = equipment_frame(dataset)
+        if frame.empty:
+            return 0
+        type_codes, types = pd.factorize(frame['equipment_type'])
+        types = [str(t) for t in types]
+        columns = {column: frame[column].to_numpy(dtype=np.float64) for column in NUMERIC_COLUMNS}
+        bounds = exact_bounds(columns, type_codes, len(types))
+        blocks = [(0, type_codes, columns)]
+        names = frame['equipment_name'].to_numpy()
+        names_at = lambda positions: names[positions].tolist()
+
+    count = 0
+    for block in find_anomalies(blocks, types, bounds, names_at):
+        count += insert_anomalies(dataset.id, block)
+    return count
+
+
+def get_anomaly_count(dataset):
+    """The stored anomaly count, running detection first for datasets that predate it or had rows appended"""
+    if dataset.anomaly_count is None:
+        with transaction.atomic():
+            # Locked, so an append cannot change the rows while they are checked
+            locked = Dataset.objects.lock(dataset.pk)
+            if locked.anomaly_count is None:
+                locked.anomaly_count = detect_anomalies(locked)
+                # Moves the dataset's version, so cached responses without the count are revalidated
+                locked.updated_at = timezone.now()
+                locked.save(update_fields=['anomaly_count', 'updated_at'])
+        dataset.anomaly_count, dataset.updated_at = locked.anomaly_count, locked.updated_at
+    return dataset.anomaly_count
+
+
+def iter_flagged_cells(dataset):
+    """(row, {parameter, ...}) of the flagged values in row order, read through a server-side cursor"""
+    cells = dataset.anomalies.order_by('row').values_list('row', 'parameter').iterator(
+        chunk_size=settings.EQUIPMENT_STREAM_CHUNK_SIZE
+    )
+    for row, group in groupby(cells, key=itemgetter(0)):
+        yield row, {parameter for _, parameter in group}
+
+
+def flagged_cells(dataset, last_row=None):
+    """{row: {parameter, ...}} of the flagged values (up to last_row), for highlighting report tables"""
+    queryset = dataset.anomalies.all()
+    if last_row is not None:
+        queryset = queryset.filter(row__lte=last_row)
+    cells = {}
+    for row, parameter in queryset.values_list('row', 'parameter'):
+        cells.setdefault(row, set()).add(parameter)
+    return cells
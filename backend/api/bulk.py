@@ -0,0 +1,115 @@
+from io import StringIO
+from itertools import chain, repeat
+from django.db import connections
+from .models import Anomaly, Equipment
+
+
+# Equipment columns in insert order; dataset_id is prepended to every row
+EQUIPMENT_COLUMNS = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+ANOMALY_COLUMNS = ['row', 'equipment_name', 'equipment_type', 'parameter', 'value', 'zscore', 'by_zscore', 'by_iqr']
+
+# Used when the backend does not report a bind parameter limit
+DEFAULT_MAX_PARAMS = 999
+
+
+def insert_equipment(dataset_id, chunk, using='default'):
+    """Insert a DataFrame of Equipment fields for one dataset without building model instances.
+
+    PostgreSQL gets a single COPY FROM STDIN; other backends get multi-row
+    INSERTs sized to the bind parameter limit. Run inside a transaction.
+    """
+    return _insert(Equipment, EQUIPMENT_COLUMNS, dataset_id, chunk, using)
+
+
+def insert_anomalies(dataset_id, frame, using='default'):
+    """Insert a DataFrame of Anomaly fields (NaN zscore becomes NULL) the same way as insert_equipment"""
+    return _insert(Anomaly, ANOMALY_COLUMNS, dataset_id, frame, using)
+
+
+def _insert(model, fields, dataset_id, frame, using):
+    if frame.empty:
+        return 0
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        _copy_insert(connection, model, fields, dataset_id, frame)
+    else:
+        _batched_insert(connection, model, fields, dataset_id, frame)
+    return len(frame)
+
+
+def _table_and_columns(connection, model, fields):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(col) for col in ['dataset_id'] + fields)
+    return table, columns
+
+
+def _copy_insert(connection, model, fields, dataset_id, frame):
+    table, columns = _table_and_columns(connection, model, fields)
+
+    buffer = StringIO()
+    frame.assign(dataset_id=dataset_id).to_csv(
+        buffer, columns=['dataset_id'] + fields, header=False, index=False
+    )
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _batched_insert(connection, model, fields, dataset_id, frame):
+    table, columns = _table_and_columns(connection, model, fields)
+    width = len(fields) + 1
+    max_params = connection.features.max_query_params or DEFAULT_MAX_PARAMS
+    batch_rows = max(1, max_params // width)
+
+    # tolist() converts each column to Python objects in one pass
+    rows = list(zip(
+        repeat(dataset_id),
+        *(_column_values(frame[col]) for col in fields),
+    ))
+
+    placeholder = '(' + ', '.join(['%s'] * width) + ')'
+    insert_sql = f'INSERT INTO {table} ({columns}) VALUES '
+    full_batch_sql = insert_sql + ', '.join([placeholder] * batch_rows)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_rows):
+            batch = rows[start:start + batch_rows]
+            if len(batch) == batch_rows:
+                sql = full_batch_sql
+            else:
+                sql = insert_sql + ', '.join([placeholder] * len(batch))
+            cursor.execute(sql, list(chain.from_iterable(batch)))
+
+
+def _column_values(column):
+    """Python values of a column, with NaN as None so it is stored as NULL"""
+    if column.hasnans:
+        return column.astype(object).where(column.notna(), None).tolist()
+    return column.tolist()
+
+
+def copy_equipment(source_dataset_id, dataset_id, using='default'):
+    """Duplicate one dataset's rows under another with a single INSERT ... SELECT"""
+    _copy_rows(Equipment, EQUIPMENT_COLUMNS, source_dataset_id, dataset_id, using)
+
+
+def copy_anomalies(source_dataset_id, dataset_id, using='default'):
+    """Duplicate one dataset's anomalies under another, keeping their order"""
+    _copy_rows(Anomaly, ANOMALY_COLUMNS, source_dataset_id, dataset_id, using)
+
+
+def _copy_rows(model, fields, source_dataset_id, dataset_id, using):
+    connection = connections[using]
+    table, columns = _table_and_columns(connection, model, fields)
+    quote = connection.ops.quote_name
+    source_columns = ', '.join(['%s'] + [quote(col) for col in fields])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {source_columns} FROM {table} '
+            f'WHERE {quote("dataset_id")} = %s ORDER BY {quote("id")}',
+            [dataset_id, source_dataset_id]
+        )
@@ -0,0 +1,54 @@
+import functools
+import hashlib
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def dataset_version(dataset):
+    """Changes whenever the dataset's content does: at upload and on every append"""
+    return dataset.updated_at or dataset.uploaded_at
+
+
+def dataset_etag(dataset, request, version=None):
+    """Strong ETag for one representation (path, query and format) of a dataset, built by code at version"""
+    key = '|'.join([
+        str(dataset.pk),
+        dataset_version(dataset).isoformat(),
+        '' if version is None else str(version),
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        getattr(request, 'accepted_media_type', '') or '',
+    ])
+    return quote_etag(hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+
+def conditional_dataset(view=None, *, version=None):
+    """Answer If-None-Match / If-Modified-Since from the dataset row alone, and tag fresh responses.
+
+    The wrapped viewset method must look its dataset up with self.get_object(),
+    which DatasetViewSet memoizes, so the check costs no extra query. Views whose
+    output also depends on a template pass @conditional_dataset(version=...), so
+    bumping it changes their ETags.
+    """
+    if view is None:
+        return functools.partial(conditional_dataset, version=version)
+
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        dataset = self.get_object()
+        etag = dataset_etag(dataset, request, version)
+        last_modified = int(dataset_version(dataset).timestamp())
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, max_age=settings.DATASET_CACHE_MAX_AGE)
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+    return wrapper
@@ -0,0 +1,291 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from django.db.models import Count
+from .models import Dataset
+
+
+COLUMNS_DIR = 'media/columns'
+FORMAT_VERSION = 1
+
+# Numeric columns, each stored as <name>.f8
+NUMERIC_COLUMNS = ['flowrate', 'pressure', 'temperature']
+NUMERIC_DTYPE = '<f8'
+TYPE_CODES_FILE = 'type_codes.i4'
+TYPE_CODE_DTYPE = '<i4'
+NAMES_FILE = 'names.bin'
+NAME_OFFSETS_FILE = 'name_offsets.i8'
+NAME_OFFSET_DTYPE = '<i8'
+META_FILE = 'meta.json'
+
+
+def store_path(key):
+    return os.path.join(COLUMNS_DIR, str(key))
+
+
+class ColumnWriter:
+    """Append-only writer for a dataset's columns.
+
+    Numeric columns are raw little-endian arrays, equipment types are
+    dictionary-encoded as int32 codes and names are UTF-8 bytes plus an
+    offsets array. A new store is written to a temporary directory and
+    renamed into place on close(), so readers never see a partial store.
+    With append=True an existing store grows in place; meta.json is
+    replaced last, so readers only ever see whole appends.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.append_mode = append
+        file_names = [f'{column}.f8' for column in NUMERIC_COLUMNS]
+        file_names += [TYPE_CODES_FILE, NAMES_FILE, NAME_OFFSETS_FILE]
+
+        if append:
+            self.temp_path = path
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            self._original_meta = meta
+            self.rows = meta['rows']
+            self.types = {t: code for code, t in enumerate(meta['types'])}
+            # Bytes past what meta.json covers come from an aborted append; drop them
+            self._sizes = {
+                f'{column}.f8': self.rows * np.dtype(NUMERIC_DTYPE).itemsize for column in NUMERIC_COLUMNS
+            }
+            self._sizes[TYPE_CODES_FILE] = self.rows * np.dtype(TYPE_CODE_DTYPE).itemsize
+            self._sizes[NAME_OFFSETS_FILE] = (self.rows + 1) * np.dtype(NAME_OFFSET_DTYPE).itemsize
+            offsets = np.memmap(os.path.join(path, NAME_OFFSETS_FILE), dtype=NAME_OFFSET_DTYPE, mode='r',
+                                shape=(self.rows + 1,))
+            self.name_bytes = int(offsets[-1])
+            del offsets
+            self._sizes[NAMES_FILE] = self.name_bytes
+            for name, size in self._sizes.items():
+                os.truncate(os.path.join(path, name), size)
+            self._files = {name: open(os.path.join(path, name), 'ab') for name in file_names}
+            return
+
+        self.temp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+        os.makedirs(self.temp_path)
+        self.rows = 0
+        self.name_bytes = 0
+        self.types = {}
+        self._files = {name: open(os.path.join(self.temp_path, name), 'wb') for name in file_names}
+        self._files[NAME_OFFSETS_FILE].write(np.zeros(1, dtype=NAME_OFFSET_DTYPE).tobytes())
+
+    def append(self, chunk):
+        """Write a DataFrame with Equipment field names as columns"""
+        if chunk.empty:
+            return
+        for column in NUMERIC_COLUMNS:
+            self._files[f'{column}.f8'].write(chunk[column].to_numpy(dtype=NUMERIC_DTYPE).tobytes())
+
+        codes = np.fromiter(
+            (self.types.setdefault(value, len(self.types)) for value in chunk['equipment_type']),
+            dtype=TYPE_CODE_DTYPE,
+            count=len(chunk),
+        )
+        self._files[TYPE_CODES_FILE].write(codes.tobytes())
+
+        encoded = [name.encode('utf-8') for name in chunk['equipment_name']]
+        lengths = np.fromiter((len(name) for name in encoded), dtype=NAME_OFFSET_DTYPE, count=len(encoded))
+        offsets = self.name_bytes + np.cumsum(lengths)
+        self._files[NAMES_FILE].write(b''.join(encoded))
+        self._files[NAME_OFFSETS_FILE].write(offsets.astype(NAME_OFFSET_DTYPE).tobytes())
+        self.name_bytes = int(offsets[-1])
+        self.rows += len(chunk)
+
+    def _write_meta(self, meta=None):
+        meta = meta or {
+            'version': FORMAT_VERSION,
+            'rows': self.rows,
+            'types': sorted(self.types, key=self.types.get),
+        }
+        temp_meta = os.path.join(self.temp_path, f'{META_FILE}.tmp')
+        with open(temp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_meta, os.path.join(self.temp_path, META_FILE))
+
+    def close(self):
+        """Finish the store and return its path"""
+        for f in self._files.values():
+            f.close()
+        self._write_meta()
+        if self.append_mode:
+            return self.path
+
+        # Identical content may already have been written by another upload
+        if os.path.exists(self.path):
+            shutil.rmtree(self.temp_path)
+        else:
+            os.replace(self.temp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discard what this writer added; in append mode this also undoes a close()"""
+        for f in self._files.values():
+            f.close()
+        if self.append_mode:
+            # meta.json first, so readers never see more rows than the files hold
+            self._write_meta(self._original_meta)
+            for name, size in self._sizes.items():
+                os.truncate(os.path.join(self.path, name), size)
+        else:
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+
+
+class ColumnStore:
+    """Read-only, memory-mapped view of a dataset's columns"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.rows = meta['rows']
+        self.types = meta['types']
+
+    @classmethod
+    def for_dataset(cls, dataset):
+        """The dataset's store, or None when it only has Equipment rows"""
+        if dataset.columns_path and os.path.exists(os.path.join(dataset.columns_path, META_FILE)):
+            return cls(dataset.columns_path)
+        return None
+
+    def _map(self, name, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=(length,))
+
+    def column(self, name):
+        return self._map(f'{name}.f8', NUMERIC_DTYPE, self.rows)
+
+    @property
+    def type_codes(self):
+        return self._map(TYPE_CODES_FILE, TYPE_CODE_DTYPE, self.rows)
+
+    def type_counts(self):
+        """[(equipment_type, count)] sorted by count, largest first, ties by name"""
+        counts = np.bincount(self.type_codes, minlength=len(self.types))
+        pairs = [(self.types[i], int(counts[i])) for i in range(len(self.types)) if counts[i]]
+        return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+
+    @property
+    def name_offsets(self):
+        """rows + 1 byte offsets into name_bytes"""
+        return self._map(NAME_OFFSETS_FILE, NAME_OFFSET_DTYPE, self.rows + 1)
+
+    @property
+    def name_bytes(self):
+        """Every name's UTF-8 bytes, back to back"""
+        length = int(self.name_offsets[-1]) if self.rows else 0
+        return self._map(NAMES_FILE, np.uint8, length)
+
+    def names(self, start=0, stop=None):
+        stop = self.rows if stop is None else min(stop, self.rows)
+        if stop <= start:
+            return []
+        offsets = self.name_offsets[start:stop + 1]
+        base = int(offsets[0])
+        raw = self.name_bytes[base:int(offsets[-1])].tobytes()
+        return [
+            raw[int(begin) - base:int(end) - base].decode('utf-8')
+            for begin, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def names_at(self, positions):
+        """Names of the rows at the given positions, without decoding the rows in between"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return []
+        offsets = self.name_offsets
+        raw = self.name_bytes
+        return [
+            raw[int(begin):int(end)].tobytes().decode('utf-8')
+            for begin, end in zip(offsets[positions], offsets[positions + 1])
+        ]
+
+    def records(self, start=0, stop=None):
+        """Rows as dicts shaped like EquipmentSerializer output; id is the row's position"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        names = self.names(start, stop)
+        types = [self.types[code] for code in self.type_codes[start:stop].tolist()]
+        columns = {name: self.column(name)[start:stop].tolist() for name in NUMERIC_COLUMNS}
+        return [
+            {
+                'id': start + i + 1,
+                'equipment_name': names[i],
+                'equipment_type': types[i],
+                'flowrate': columns['flowrate'][i],
+                'pressure': columns['pressure'][i],
+                'temperature': columns['temperature'][i],
+            }
+            for i in range(len(names))
+        ]
+
+
+def count_types(dataset):
+    """[{'equipment_type', 'count'}] largest first, counted from the column store or Equipment rows"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return [{'equipment_type': t, 'count': count} for t, count in store.type_counts()]
+    return list(
+        dataset.equipment.values('equipment_type')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'equipment_type')
+    )
+
+
+def get_type_distribution(dataset):
+    """The distribution stored at ingestion; only datasets predating it are counted again"""
+    if dataset.type_distribution or not dataset.total_count:
+        return dataset.type_distribution
+    return count_types(dataset)
+
+
+def equipment_records(dataset, limit=None):
+    """Equipment rows as dicts, read from the column store when the dataset has one"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return store.records(0, limit)
+    queryset = dataset.equipment.values(
+        'id', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature'
+    )
+    return list(queryset[:limit] if limit is not None else queryset)
+
+
+def detach_store(dataset):
+    """Path of a store only this dataset uses, so rows can be appended to it in place.
+
+    Stores named by content hash are shared with clones and reused for later
+    uploads of the same bytes. The first append moves the store to
+    dataset-<id>, or copies it there when other datasets still read it.
+    """
+    path = store_path(f'dataset-{dataset.id}')
+    current = dataset.columns_path
+    if current == path:
+        return path
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    if Dataset.objects.filter(columns_path=current).exclude(pk=dataset.pk).exists():
+        temp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+        shutil.copytree(current, temp_path)
+        os.replace(temp_path, path)
+    else:
+        os.replace(current, path)
+    return path
+
+
+def reattach_store(original, path):
+    """Undo detach_store() after a failed append"""
+    if path == original:
+        return
+    if os.path.exists(original):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.replace(path, original)
+
+
+def remove_store_if_unused(path):
+    """Delete a column store once no dataset points at it any more"""
+    if path and os.path.isdir(path) and not Dataset.objects.filter(columns_path=path).exists():
+        shutil.rmtree(path)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from rest_framework.exceptions import NotFound, ValidationError
+from .columnar import NUMERIC_COLUMNS
+from .statistics import get_statistics
+
+
+# Per-type figures taken from each dataset's stored statistics
+TYPE_AGGREGATES = ['mean', 'std', 'min', 'max', 'median']
+
+
+def parse_dataset_ids(value):
+    try:
+        ids = [int(part) for part in (value or '').split(',') if part]
+    except ValueError:
+        raise ValidationError({'ids': 'Must be a comma-separated list of dataset ids'})
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValidationError({'ids': 'Give at least one dataset id'})
+    if len(ids) > settings.COMPARE_MAX_DATASETS:
+        raise ValidationError({'ids': f'Compare at most {settings.COMPARE_MAX_DATASETS} datasets'})
+    return ids
+
+
+def compare_datasets(queryset, ids):
+    """Side-by-side aggregates for datasets in ids order, read from stored statistics in one query.
+
+    Every list in the result lines up with 'datasets'; None marks a type a dataset doesn't have.
+    """
+    datasets = {dataset.id: dataset for dataset in queryset.filter(id__in=ids)}
+    missing = [dataset_id for dataset_id in ids if dataset_id not in datasets]
+    if missing:
+        raise NotFound(f'Datasets not found: {", ".join(map(str, missing))}')
+    datasets = [datasets[dataset_id] for dataset_id in ids]
+    statistics = [get_statistics(dataset) for dataset in datasets]
+
+    parameters = {}
+    for column in NUMERIC_COLUMNS:
+        stored = [stats['parameters'][column] for stats in statistics]
+        parameters[column] = {
+            'avg': [getattr(dataset, f'avg_{column}') for dataset in datasets],
+            'min': [getattr(dataset, f'min_{column}') for dataset in datasets],
+            'max': [getattr(dataset, f'max_{column}') for dataset in datasets],
+            'std': [values.get('std') for values in stored],
+            'median': [values.get('median') for values in stored],
+        }
+
+    per_dataset = [{entry['equipment_type']: entry for entry in stats['by_type']} for stats in statistics]
+    totals = {}
+    for types in per_dataset:
+        for equipment_type, entry in types.items():
+            totals[equipment_type] = totals.get(equipment_type, 0) + entry['count']
+
+    by_type = []
+    for equipment_type in sorted(totals, key=lambda t: (-totals[t], t)):
+        entries = [types.get(equipment_type) for types in per_dataset]
+        row = {
+            'equipment_type': equipment_type,
+            'count': [entry['count'] if entry else 0 for entry in entries],
+        }
+        for column in NUMERIC_COLUMNS:
+            row[column] = {
+                aggregate: [entry[column].get(aggregate) if entry else None for entry in entries]
+                for aggregate in TYPE_AGGREGATES
+            }
+        by_type.append(row)
+
+    return {
+        'datasets': [
+            {'id': d.id, 'name': d.name, 'uploaded_at': d.uploaded_at, 'total_count': d.total_count}
+            for d in datasets
+        ],
+        'parameters': parameters,
+        'by_type': by_type,
+    }
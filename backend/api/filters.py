@@ -0,0 +1,77 @@
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+from .ingest import PARAMETERS
+from .anomalies import METHODS as ANOMALY_METHODS
+
+
+ORDERING_FIELDS = ['id', 'equipment_name', 'equipment_type'] + PARAMETERS
+FILTER_PARAMS = ['type', 'search', 'ordering'] + [
+    f'{param}_{bound}' for param in PARAMETERS for bound in ('min', 'max')
+]
+
+
+def _parse_float(params, key):
+    value = params.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValidationError({key: 'Must be a number'})
+
+
+def filter_equipment(queryset, params):
+    """Apply ?type=, ?<parameter>_min/_max= and ?search= (name prefix) to an Equipment queryset"""
+    types = [t for t in params.get('type', '').split(',') if t]
+    if len(types) == 1:
+        queryset = queryset.filter(equipment_type=types[0])
+    elif types:
+        queryset = queryset.filter(equipment_type__in=types)
+
+    for param in PARAMETERS:
+        low = _parse_float(params, f'{param}_min')
+        high = _parse_float(params, f'{param}_max')
+        if low is not None:
+            queryset = queryset.filter(**{f'{param}__gte': low})
+        if high is not None:
+            queryset = queryset.filter(**{f'{param}__lte': high})
+
+    prefix = params.get('search', '')
+    if prefix:
+        queryset = queryset.filter(equipment_name__startswith=prefix)
+        # LIKE ... ESCAPE can't use an index outside PostgreSQL; this range on equipment_dataset_name_idx can
+        if connection.vendor != 'postgresql':
+            queryset = queryset.filter(equipment_name__gte=prefix, equipment_name__lt=prefix + '\U0010ffff')
+    return queryset
+
+
+def filter_anomalies(queryset, params):
+    """Apply ?parameter=, ?method=zscore|iqr and ?type=A,B to an Anomaly queryset"""
+    parameter = params.get('parameter')
+    if parameter:
+        if parameter not in PARAMETERS:
+            raise ValidationError({'parameter': f'Must be one of {", ".join(PARAMETERS)}'})
+        queryset = queryset.filter(parameter=parameter)
+
+    method = params.get('method')
+    if method:
+        if method not in ANOMALY_METHODS:
+            raise ValidationError({'method': f'Must be one of {", ".join(ANOMALY_METHODS)}'})
+        queryset = queryset.filter(**{f'by_{method}': True})
+
+    types = [t for t in params.get('type', '').split(',') if t]
+    if types:
+        queryset = queryset.filter(equipment_type__in=types)
+    return queryset
+
+
+def equipment_ordering(params):
+    """Cursor ordering for ?ordering=<field> or -<field>, with id as the tie-breaker"""
+    ordering = params.get('ordering', 'id')
+    field = ordering.lstrip('-')
+    if field not in ORDERING_FIELDS:
+        raise ValidationError({'ordering': f'Must be one of {", ".join(ORDERING_FIELDS)}'})
+    if field == 'id':
+        return (ordering,)
+    descending = ordering.startswith('-')
+    return (ordering, '-id' if descending else 'id')
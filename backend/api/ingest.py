@@ -0,0 +1,339 @@
+import hashlib
+import os
+import shutil
+import uuid
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset, Job
+from .bulk import insert_equipment, copy_equipment, copy_anomalies
+from .columnar import ColumnStore, ColumnWriter, store_path, detach_store, reattach_store
+from .sketches import DatasetSketch
+from .statistics import store_statistics
+from .anomalies import detect_anomalies
+from .schema import (
+    EQUIPMENT_SCHEMA, PARSE_ERRORS, CSVValidationError, RejectionLog,
+    read_raw_chunks, coerce_chunk, rejections_path,
+)
+
+
+REQUIRED_COLUMNS = [column.header for column in EQUIPMENT_SCHEMA]
+PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+# CSV header -> Equipment field
+COLUMN_MAP = {column.header: column.field for column in EQUIPMENT_SCHEMA}
+
+# Dataset fields computed from the rows, copied as-is when identical bytes are uploaded again
+DERIVED_FIELDS = [
+    'total_count', 'size_bytes', 'columns_path', 'type_distribution', 'statistics', 'sketches', 'anomaly_count',
+    'rejected_count',
+] + [
+    f'{aggregate}_{param}' for param in PARAMETERS for aggregate in ('avg', 'sum', 'min', 'max')
+]
+
+# Uploads are stored as <UPLOAD_DIR>/<sha256[:2]>/<sha256>.csv
+UPLOAD_DIR = 'media/uploads'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class RunningStats:
+    """Count, sum, min and max of each parameter, rows per type and quantile sketches, updated one chunk at a time"""
+
+    def __init__(self):
+        self.count = 0
+        self.type_counts = {}
+        self.sketch = DatasetSketch()
+        self.sums = {param: 0.0 for param in PARAMETERS}
+        self.mins = {param: None for param in PARAMETERS}
+        self.maxs = {param: None for param in PARAMETERS}
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        """Resume from the aggregates stored on a dataset, to add more rows to it"""
+        stats = cls()
+        stats.count = dataset.total_count
+        stats.type_counts = {entry['equipment_type']: entry['count'] for entry in dataset.type_distribution}
+        # Without a stored sketch, one covering only new rows would be wrong; it is rebuilt from the store later
+        stats.sketch = DatasetSketch.from_dict(dataset.sketches) if dataset.sketches else None
+        for param in PARAMETERS:
+            stats.sums[param] = getattr(dataset, f'sum_{param}')
+            stats.mins[param] = getattr(dataset, f'min_{param}')
+            stats.maxs[param] = getattr(dataset, f'max_{param}')
+        return stats
+
+    def update(self, chunk):
+        if chunk.empty:
+            return
+        self.count += len(chunk)
+        if self.sketch is not None:
+            self.sketch.update(chunk)
+        for equipment_type, count in chunk['equipment_type'].value_counts(sort=False).items():
+            self.type_counts[equipment_type] = self.type_counts.get(equipment_type, 0) + int(count)
+        for param in PARAMETERS:
+            column = chunk[param]
+            self.sums[param] += float(column.sum())
+            low, high = float(column.min()), float(column.max())
+            self.mins[param] = low if self.mins[param] is None else min(self.mins[param], low)
+            self.maxs[param] = high if self.maxs[param] is None else max(self.maxs[param], high)
+
+    def as_fields(self):
+        """Dataset field values for the rows seen so far"""
+        fields = {'total_count': self.count}
+        for param in PARAMETERS:
+            fields[f'avg_{param}'] = self.sums[param] / self.count if self.count else None
+            fields[f'sum_{param}'] = self.sums[param]
+            fields[f'min_{param}'] = self.mins[param]
+            fields[f'max_{param}'] = self.maxs[param]
+        fields['sketches'] = self.sketch.to_dict() if self.sketch is not None else {}
+        fields['type_distribution'] = [
+            {'equipment_type': equipment_type, 'count': count}
+            for equipment_type, count in sorted(self.type_counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+        return fields
+
+
+def content_path(content_hash):
+    return os.path.join(UPLOAD_DIR, content_hash[:2], f'{content_hash}.csv')
+
+
+def store_by_hash(temp_path, content_hash):
+    """Move a file to its content-addressed path, dropping it if those bytes are already stored"""
+    file_path = content_path(content_hash)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    if os.path.exists(file_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, file_path)
+    return file_path
+
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source:
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_upload(file):
+    """Stream an uploaded file to disk, hashing it on the way, and return (path, content_hash)"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    temp_path = os.path.join(UPLOAD_DIR, f'.incoming-{uuid.uuid4().hex}')
+    digest = hashlib.sha256()
+
+    with open(temp_path, 'wb') as destination:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            destination.write(chunk)
+
+    content_hash = digest.hexdigest()
+    return store_by_hash(temp_path, content_hash), content_hash
+
+
+def remove_upload_if_unused(file_path):
+    """Delete a stored upload once no dataset points at it any more"""
+    if os.path.exists(file_path) and not Dataset.objects.filter(file_path=file_path).exists():
+        os.remove(file_path)
+
+
+def validate_columns(file_path):
+    """Check the CSV header without reading any rows"""
+    columns = pd.read_csv(file_path, nrows=0).columns
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise CSVValidationError(f'Missing required columns: {", ".join(missing_columns)}')
+
+
+def read_csv_chunks(file_path, chunk_size=None, rejections=None):
+    """Yield the valid rows as DataFrames with Equipment field names as columns and parsed dtypes.
+
+    Chunks are parsed by pyarrow when it is installed and coerced by the
+    schema in one vectorized pass each. Rows with a bad value are skipped
+    and their reasons handed to rejections, a RejectionLog.
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    seen = 0
+    try:
+        for raw in read_raw_chunks(file_path, chunk_size):
+            chunk, rejected = coerce_chunk(raw, seen)
+            seen += len(raw)
+            if rejections is not None:
+                rejections.add(rejected)
+            yield chunk
+    except PARSE_ERRORS as e:
+        raise CSVValidationError(f'Malformed CSV: {e}')
+
+
+def ingest_csv(dataset, file_path, chunk_size=None, on_chunk=None):
+    """Write the rows of a CSV to dataset's column store (and Equipment table) chunk by chunk.
+
+    Each chunk is inserted in its own transaction (a savepoint when the caller
+    already holds one); on_chunk(stats) runs inside it after the insert.
+    Rows the schema rejects go to the dataset's rejection report; the upload
+    fails when more than INGEST_MAX_REJECTED_FRACTION of them are rejected.
+    Sets dataset.columns_path and dataset.statistics (computed over the finished
+    store in one vectorized pass), stores the rows flagged as anomalies and
+    sets dataset.anomaly_count, and returns the accumulated stats.
+    """
+    stats = RunningStats()
+    rejections = RejectionLog(dataset.id, dataset.name)
+    writer = ColumnWriter(store_path(dataset.content_hash or f'dataset-{dataset.id}'))
+    try:
+        for chunk in read_csv_chunks(file_path, chunk_size, rejections):
+            writer.append(chunk)
+            with transaction.atomic():
+                if settings.STORE_EQUIPMENT_ROWS:
+                    insert_equipment(dataset.id, chunk)
+                stats.update(chunk)
+                if on_chunk:
+                    on_chunk(stats)
+        rejections.check(stats.count)
+    except Exception:
+        writer.abort()
+        rejections.discard()
+        raise
+    rejections.close()
+    dataset.rejected_count = rejections.rows
+    dataset.columns_path = writer.close()
+    store = ColumnStore(dataset.columns_path)
+    dataset.statistics = store_statistics(store, stats.sketch)
+    dataset.anomaly_count = detect_anomalies(dataset, store, dataset.statistics, stats.sketch)
+    return stats
+
+
+def apply_stats(dataset, stats):
+    for field, value in stats.as_fields().items():
+        setattr(dataset, field, value)
+    dataset.save()
+
+
+def find_ingested(user, content_hash):
+    """A finished dataset of user's built from the same bytes, if there is one.
+
+    Only the user's own datasets are reused: a clone would also copy the
+    source's rejection report and reveal another user's upload. Identical
+    bytes from someone else are ingested again (their column store is still
+    shared on disk).
+    """
+    if not content_hash:
+        return None
+    return (
+        Dataset.objects.ready().filter(user=user, content_hash=content_hash)
+        .order_by('-uploaded_at')
+        .first()
+    )
+
+
+def clone_dataset(source, user, name):
+    """New dataset with source's stats and a server-side copy of its rows; no CSV parsing"""
+    with transaction.atomic():
+        dataset = Dataset.objects.create(
+            user=user,
+            name=name,
+            file_path=source.file_path,
+            content_hash=source.content_hash,
+            **{field: getattr(source, field) for field in DERIVED_FIELDS}
+        )
+        copy_equipment(source.id, dataset.id)
+        copy_anomalies(source.id, dataset.id)
+    if os.path.exists(rejections_path(source.id)):
+        os.makedirs(os.path.dirname(rejections_path(dataset.id)), exist_ok=True)
+        shutil.copyfile(rejections_path(source.id), rejections_path(dataset.id))
+    return dataset
+
+
+def create_dataset_from_file(user, name, file_path, content_hash='', chunk_size=None):
+    """Build a Dataset and its Equipment rows from a CSV already on disk.
+
+    Ingests inline like an ingest job: chunks commit as they go, the dataset
+    stays out of Dataset.objects.ready() until the last one is in, and it is
+    deleted again if ingestion fails.
+    """
+    source = find_ingested(user, content_hash)
+    if source:
+        return clone_dataset(source, user, name)
+
+    validate_columns(file_path)
+
+    # Recorded as a running ingest job, which keeps the dataset out of ready() until its
+    # last chunk commits; chunks commit one by one rather than holding the write lock throughout
+    with transaction.atomic():
+        dataset = Dataset.objects.create(
+            user=user, name=name, file_path=file_path, content_hash=content_hash,
+            size_bytes=os.path.getsize(file_path)
+        )
+        job = Job.objects.create(
+            user=user, kind=Job.KIND_INGEST, state=Job.STATE_RUNNING, started_at=timezone.now(), dataset=dataset,
+            payload={'name': name, 'file_path': file_path, 'content_hash': content_hash}
+        )
+
+    def report_progress(stats):
+        Job.objects.filter(pk=job.pk).update(rows_processed=stats.count)
+
+    try:
+        stats = ingest_csv(dataset, file_path, chunk_size, on_chunk=report_progress)
+        apply_stats(dataset, stats)
+    except Exception as e:
+        dataset.delete()
+        Job.objects.filter(pk=job.pk).update(state=Job.STATE_FAILED, error=str(e), finished_at=timezone.now())
+        raise
+    Job.objects.filter(pk=job.pk).update(state=Job.STATE_DONE, finished_at=timezone.now())
+    return dataset
+
+
+def append_csv(dataset_id, file_path, name='', chunk_size=None):
+    """Add a CSV's rows to an existing dataset and return (dataset, rows added).
+
+    The work is proportional to the new rows: total_count, type counts and
+    avg/min/max continue from the stored running aggregates, sketches are
+    merged and the column store grows in place. Extended statistics and
+    anomaly flags depend on every row, so they are cleared; the append view
+    queues a refresh job to rebuild them, and a request that arrives first
+    rebuilds them itself.
+    """
+    validate_columns(file_path)
+
+    with transaction.atomic():
+        # Locks the row, so concurrent appends to one dataset run one after another
+        dataset = Dataset.objects.lock(dataset_id)
+        stats = RunningStats.from_dataset(dataset)
+        rejections = RejectionLog(dataset.id, name)
+        added = 0
+
+        original_path = dataset.columns_path
+        path = writer = None
+        # Everything up to the end of the transaction is covered: if the database rolls back, so do the files
+        try:
+            if ColumnStore.for_dataset(dataset) is not None:
+                path = detach_store(dataset)
+                writer = ColumnWriter(path, append=True)
+            for chunk in read_csv_chunks(file_path, chunk_size, rejections):
+                if writer is not None:
+                    writer.append(chunk)
+                if settings.STORE_EQUIPMENT_ROWS or writer is None:
+                    insert_equipment(dataset.id, chunk)
+                stats.update(chunk)
+                added += len(chunk)
+            rejections.check(added)
+            if writer is not None:
+                dataset.columns_path = writer.close()
+            rejections.close()
+
+            # The rows no longer match the uploaded bytes, so this dataset must not be reused for them
+            dataset.content_hash = ''
+            dataset.statistics = {}
+            dataset.anomalies.all().delete()
+            dataset.anomaly_count = None
+            dataset.rejected_count += rejections.rows
+            dataset.size_bytes += os.path.getsize(file_path)
+            dataset.updated_at = timezone.now()
+            apply_stats(dataset, stats)
+        except Exception:
+            if writer is not None:
+                writer.abort()
+            if path is not None:
+                reattach_store(original_path, path)
+            rejections.discard()
+            raise
+    return dataset, added
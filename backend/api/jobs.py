@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .models import Dataset, Job
+from .utils import generate_full_pdf_report
+from .ingest import (
+    validate_columns, ingest_csv, apply_stats,
+    find_ingested, clone_dataset, remove_upload_if_unused,
+)
+from .retention import enforce_retention
+from .columnar import remove_store_if_unused
+from .reports import remove_reports
+from .schema import remove_rejections
+from .statistics import get_statistics
+from .anomalies import get_anomaly_count
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovery_thread = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix='job')
+        return _executor
+
+
+def enqueue(user, kind, dataset=None, **payload):
+    """Record a job and hand it to the local worker pool once the transaction commits"""
+    job = Job.objects.create(user=user, kind=kind, dataset=dataset, payload=payload)
+    if settings.JOB_WORKERS > 0:
+        transaction.on_commit(lambda: _get_executor().submit(run_job, job.pk))
+    return job
+
+
+def claim(job_id):
+    """Move a queued job to running; False if another worker got there first"""
+    return Job.objects.filter(pk=job_id, state=Job.STATE_QUEUED).update(
+        state=Job.STATE_RUNNING, started_at=timezone.now()
+    ) == 1
+
+
+def run_job(job_id):
+    """Claim and execute a single job, recording the outcome on its row"""
+    close_old_connections()
+    try:
+        if not claim(job_id):
+            return
+        job = Job.objects.get(pk=job_id)
+        try:
+            HANDLERS[job.kind](job)
+        except Exception as e:
+            logger.exception('Job %s failed', job_id)
+            Job.objects.filter(pk=job_id).update(
+                state=Job.STATE_FAILED, error=str(e), finished_at=timezone.now()
+            )
+        else:
+            Job.objects.filter(pk=job_id).update(state=Job.STATE_DONE, finished_at=timezone.now())
+    finally:
+        # Worker threads own their connections; don't leave them open between jobs
+        connection.close()
+
+
+def requeue_stale():
+    """Queue running jobs again once they have run for JOB_STALE_MINUTES, assuming their process died.
+
+    A half-built ingestion dataset is deleted first, keeping the upload the
+    job needs to start over. Returns how many jobs were requeued.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.JOB_STALE_MINUTES)
+    requeued = 0
+    for job in Job.objects.filter(state=Job.STATE_RUNNING, started_at__lt=cutoff):
+        reset = {'state': Job.STATE_QUEUED, 'started_at': None, 'rows_processed': 0}
+        if job.kind == Job.KIND_INGEST:
+            reset['dataset'] = None
+        with transaction.atomic():
+            # Matching on started_at lets only one process requeue a given run
+            if not Job.objects.filter(pk=job.pk, state=Job.STATE_RUNNING, started_at=job.started_at).update(**reset):
+                continue
+            partial = Dataset.objects.filter(pk=job.dataset_id).first() if 'dataset' in reset else None
+            if partial is not None:
+                partial.delete()
+        if partial is not None:
+            remove_store_if_unused(partial.columns_path)
+            remove_reports(job.dataset_id)
+            remove_rejections(job.dataset_id)
+        logger.warning('Requeued job %s, running since %s', job.pk, job.started_at)
+        requeued += 1
+    return requeued
+
+
+def recover_jobs():
+    """Requeue stale jobs and hand every queued job to the local pool; claim() keeps each to one run"""
+    requeue_stale()
+    for job_id in Job.objects.filter(state=Job.STATE_QUEUED).values_list('id', flat=True):
+        _get_executor().submit(run_job, job_id)
+
+
+def _recover_forever():
+    while True:
+        try:
+            recover_jobs()
+        except Exception:
+            logger.exception('Job recovery failed')
+        finally:
+            connection.close()
+        time.sleep(settings.JOB_RECOVERY_INTERVAL_SECONDS)
+
+
+def start_workers():
+    """Pick up jobs a previous process left behind, now and every JOB_RECOVERY_INTERVAL_SECONDS.
+
+    Called once per web process; queued jobs otherwise only reach the pool
+    from the on_commit hand-off in enqueue(), which a restart loses.
+    """
+    global _recovery_thread
+    if settings.JOB_WORKERS <= 0 or _recovery_thread is not None:
+        return
+    _recovery_thread = threading.Thread(target=_recover_forever, name='job-recovery', daemon=True)
+    _recovery_thread.start()
+
+
+def run_pending():
+    """Run every queued job in this process, after requeueing stale ones, and return how many were picked up"""
+    requeue_stale()
+    job_ids = list(Job.objects.filter(state=Job.STATE_QUEUED).values_list('id', flat=True))
+    for job_id in job_ids:
+        run_job(job_id)
+    return len(job_ids)
+
+
+def run_ingest(job):
+    file_path = job.payload['file_path']
+    content_hash = job.payload.get('content_hash', '')
+
+    source = find_ingested(job.user, content_hash)
+    if source:
+        dataset = clone_dataset(source, job.user, job.payload['name'])
+        Job.objects.filter(pk=job.pk).update(dataset=dataset, rows_processed=dataset.total_count)
+        enforce_retention(job.user)
+        return
+
+    try:
+        validate_columns(file_path)
+        dataset = Dataset.objects.create(
+            user=job.user, name=job.payload['name'], file_path=file_path, content_hash=content_hash,
+            size_bytes=os.path.getsize(file_path)
+        )
+        Job.objects.filter(pk=job.pk).update(dataset=dataset)
+
+        def report_progress(stats):
+            Job.objects.filter(pk=job.pk).update(rows_processed=stats.count)
+
+        # Chunks commit as they go so progress is visible; undo the partial dataset on failure
+        try:
+            stats = ingest_csv(dataset, file_path, on_chunk=report_progress)
+            apply_stats(dataset, stats)
+        except Exception:
+            dataset.delete()
+            raise
+    except Exception:
+        remove_upload_if_unused(file_path)
+        raise
+
+    enforce_retention(job.user)
+
+
+def enqueue_full_report(user, dataset):
+    """Queue rendering of the dataset's full report, reusing a job that is already pending"""
+    pending = Job.objects.filter(kind=Job.KIND_REPORT, dataset=dataset, state__in=Job.PENDING_STATES).first()
+    return pending or enqueue(user, Job.KIND_REPORT, dataset=dataset)
+
+
+def run_report(job):
+    if job.dataset is None:
+        raise ValueError('Dataset was deleted before its report was rendered')
+    
+    def report_progress(rows):
+        Job.objects.filter(pk=job.pk).update(rows_processed=rows)
+    
+    generate_full_pdf_report(job.dataset, progress=report_progress)
+
+
+def enqueue_refresh(user, dataset):
+    """Queue rebuilding the statistics and anomalies an append cleared, unless a rebuild is already waiting"""
+    waiting = Job.objects.filter(kind=Job.KIND_REFRESH, dataset=dataset, state=Job.STATE_QUEUED).first()
+    return waiting or enqueue(user, Job.KIND_REFRESH, dataset=dataset)
+
+
+def run_refresh(job):
+    # Both save with a new dataset version, so clients revalidating cached responses get the new figures
+    if job.dataset is not None:
+        get_statistics(job.dataset)
+        get_anomaly_count(job.dataset)
+
+
+def run_retention(job):
+    Job.objects.filter(pk=job.pk).update(rows_processed=enforce_retention(job.user))
+
+
+HANDLERS = {
+    Job.KIND_INGEST: run_ingest,
+    Job.KIND_REPORT: run_report,
+    Job.KIND_RETENTION: run_retention,
+    Job.KIND_REFRESH: run_refresh,
+}
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from api.retention import enforce_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete datasets past the RETENTION_* limits for every user (run periodically for the age limit)'
+    
+    def handle(self, *args, **options):
+        total = 0
+        for user in User.objects.filter(datasets__isnull=False).distinct().iterator():
+            deleted = enforce_retention(user)
+            if deleted:
+                self.stdout.write(f'{user.username}: deleted {deleted} dataset(s)')
+            total += deleted
+        self.stdout.write(f'Deleted {total} dataset(s)')
@@ -0,0 +1,31 @@
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.models import Dataset
+from api.columnar import ColumnWriter, store_path
+
+FIELDS = ('equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature')
+
+
+class Command(BaseCommand):
+    help = 'Build column stores for datasets that only have Equipment rows'
+    
+    def handle(self, *args, **options):
+        chunk_size = settings.INGEST_CHUNK_SIZE
+        for dataset in Dataset.objects.filter(columns_path=''):
+            writer = ColumnWriter(store_path(f'dataset-{dataset.id}'))
+            rows = dataset.equipment.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+            try:
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) == chunk_size:
+                        writer.append(pd.DataFrame(batch, columns=FIELDS))
+                        batch = []
+                writer.append(pd.DataFrame(batch, columns=FIELDS))
+            except Exception:
+                writer.abort()
+                raise
+            dataset.columns_path = writer.close()
+            dataset.save(update_fields=['columns_path'])
+            self.stdout.write(f'{dataset}: {writer.rows} rows -> {dataset.columns_path}')
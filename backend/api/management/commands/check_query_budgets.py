@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+from api.querybudget import QueryBudgetExceeded, check_budget_growth
+
+
+class Command(BaseCommand):
+    help = 'Check that API endpoints stay within their query budgets and do not grow with the number of datasets'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--datasets', type=int, default=20, help='Datasets to create for the growth check')
+        parser.add_argument('--rows', type=int, default=200, help='Equipment rows per dataset')
+    
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            # Everything runs in a transaction that is rolled back, leaving the database untouched
+            with transaction.atomic():
+                failure = self.run_checks(options['datasets'], options['rows'])
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+        if failure:
+            raise CommandError(failure)
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+    
+    def run_checks(self, dataset_count, rows):
+        user = User.objects.create_user(username='query-budget-check')
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            results = check_budget_growth(client, user, dataset_count, rows)
+        except QueryBudgetExceeded as e:
+            return str(e)
+        
+        failure = None
+        for label, before, after, limit in results:
+            self.stdout.write(f'{label:<22} {before:>3} -> {after:>3} queries (budget {limit})')
+            if after != before:
+                failure = f'{label}: {before} queries with 1 dataset, {after} with {dataset_count}'
+        return failure
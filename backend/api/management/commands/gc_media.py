@@ -0,0 +1,120 @@
+import os
+import re
+import shutil
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import Dataset, Job, UploadSession
+from api.ingest import UPLOAD_DIR
+from api.columnar import COLUMNS_DIR
+from api.reports import REPORTS_DIR, evict_reports
+from api.schema import REJECTIONS_DIR
+from api.uploads import PARTIAL_DIR, discard_session
+
+REPORT_NAME_RE = re.compile(r'^report_(\d+)_')
+REJECTIONS_NAME_RE = re.compile(r'^dataset_(\d+)\.csv$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete uploads, column stores, reports and rejection reports that no dataset references, '
+        'plus abandoned upload sessions'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='only list what would be deleted')
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='leave files younger than this alone (default MEDIA_GC_GRACE_HOURS)')
+    
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        grace_hours = settings.MEDIA_GC_GRACE_HOURS if options['grace_hours'] is None else options['grace_hours']
+        # Anything newer may belong to an ingestion that hasn't saved its dataset yet
+        self.cutoff = time.time() - grace_hours * 3600
+        self.removed = 0
+        
+        self.collect_sessions(timezone.now() - timedelta(hours=grace_hours))
+        self.collect_uploads()
+        self.collect_columns()
+        self.collect_reports()
+        self.collect_rejections()
+        if not self.dry_run:
+            evict_reports()
+        
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(f'{verb} {self.removed} orphaned item(s)')
+    
+    def remove(self, path):
+        try:
+            if os.path.getmtime(path) > self.cutoff:
+                return
+        except FileNotFoundError:
+            return
+        self.stdout.write(path)
+        self.removed += 1
+        if self.dry_run:
+            return
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def collect_sessions(self, expired_before):
+        for session in UploadSession.objects.filter(created_at__lt=expired_before):
+            self.stdout.write(f'upload session {session.id}')
+            self.removed += 1
+            if not self.dry_run:
+                discard_session(session)
+        if os.path.isdir(PARTIAL_DIR):
+            live = {os.path.abspath(path) for path in UploadSession.objects.values_list('file_path', flat=True)}
+            for entry in os.scandir(PARTIAL_DIR):
+                if os.path.abspath(entry.path) not in live:
+                    self.remove(entry.path)
+    
+    def collect_uploads(self):
+        if not os.path.isdir(UPLOAD_DIR):
+            return
+        referenced = set(Dataset.objects.values_list('file_path', flat=True))
+        for payload in Job.objects.filter(state__in=Job.PENDING_STATES).values_list('payload', flat=True):
+            referenced.add(payload.get('file_path'))
+        referenced = {os.path.abspath(path) for path in referenced if path}
+        
+        partial_dir = os.path.abspath(PARTIAL_DIR)
+        for root, dirs, files in os.walk(UPLOAD_DIR):
+            # Partial uploads belong to sessions, handled by collect_sessions
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != partial_dir]
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.abspath(path) not in referenced:
+                    self.remove(path)
+    
+    def collect_columns(self):
+        if not os.path.isdir(COLUMNS_DIR):
+            return
+        referenced = {os.path.abspath(path) for path in Dataset.objects.values_list('columns_path', flat=True) if path}
+        for entry in os.scandir(COLUMNS_DIR):
+            if os.path.abspath(entry.path) not in referenced:
+                self.remove(entry.path)
+    
+    def collect_reports(self):
+        if not os.path.isdir(REPORTS_DIR):
+            return
+        existing = set(Dataset.objects.values_list('id', flat=True))
+        for entry in os.scandir(REPORTS_DIR):
+            match = REPORT_NAME_RE.match(entry.name)
+            if not match or int(match.group(1)) not in existing or not entry.name.endswith('.pdf'):
+                self.remove(entry.path)
+    
+    def collect_rejections(self):
+        if not os.path.isdir(REJECTIONS_DIR):
+            return
+        existing = set(Dataset.objects.values_list('id', flat=True))
+        for entry in os.scandir(REJECTIONS_DIR):
+            match = REJECTIONS_NAME_RE.match(entry.name)
+            if not match or int(match.group(1)) not in existing:
+                self.remove(entry.path)
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from api.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs (ingestion, reports, retention) outside the web workers'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=2.0, help='seconds between polls with --loop')
+    
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending()
+            if count:
+                self.stdout.write(f'Processed {count} job(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,246 @@
+"""Per-request timings, as a Server-Timing header and as Prometheus metrics at /metrics.
+
+RequestMetricsMiddleware records for every request the total time, the
+view's time, the number and total duration of SQL queries, the time spent
+rendering the response (DRF's renderers, or producing a streamed body) and
+the response size. It removes itself from the middleware chain unless
+REQUEST_METRICS_ENABLED is set, so it costs nothing when disabled.
+
+The counters live in the process, so with several worker processes each
+scrape of /metrics sees the process that answers it.
+"""
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class RequestTiming:
+    """Timestamps and SQL totals of one request; also the execute wrapper that counts its queries"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.rendered = None
+        self.finished = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.stream_seconds = 0.0
+        self.size = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def total(self):
+        return self.finished - self.started
+
+    @property
+    def view(self):
+        if self.view_started is None:
+            return 0.0
+        return self.view_finished - self.view_started
+
+    @property
+    def serialization(self):
+        rendering = self.rendered - self.view_finished if self.rendered and self.view_finished else 0.0
+        return rendering + self.stream_seconds
+
+    def server_timing(self):
+        """Server-Timing header value, in milliseconds; view includes the queries it ran"""
+        return ', '.join([
+            f'total;dur={self.total * 1000:.1f}',
+            f'view;dur={self.view * 1000:.1f}',
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialization * 1000:.1f}',
+        ])
+
+
+def count_queries(timing):
+    """Context manager that runs every SQL statement on this thread through timing"""
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(timing))
+    return stack
+
+
+class RouteMetrics:
+    """Aggregates of every request to one route and method"""
+
+    def __init__(self, bucket_count):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.seconds = 0.0
+        self.view_seconds = 0.0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.queries = 0
+        self.response_bytes = 0
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class MetricsRegistry:
+    """Per-route latency histograms and totals, safe to update from several threads"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._responses = {}
+
+    def observe(self, route, method, status, timing):
+        with self._lock:
+            metrics = self._routes.get((route, method))
+            if metrics is None:
+                metrics = self._routes[(route, method)] = RouteMetrics(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if timing.total <= bound:
+                    metrics.buckets[i] += 1
+            metrics.count += 1
+            metrics.seconds += timing.total
+            metrics.view_seconds += timing.view
+            metrics.db_seconds += timing.db_seconds
+            metrics.serialization_seconds += timing.serialization
+            metrics.queries += timing.queries
+            metrics.response_bytes += timing.size
+            key = (route, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self):
+        """Everything recorded so far in the Prometheus text exposition format"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            responses = sorted(self._responses.items())
+            lines = [
+                '# HELP http_request_duration_seconds Time from the request reaching the app to the last byte of the response',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (route, method), metrics in routes:
+                for bound, count in zip(self.buckets, metrics.buckets):
+                    labels = _labels(route=route, method=method, le=f'{bound:g}')
+                    lines.append(f'http_request_duration_seconds_bucket{labels} {count}')
+                labels = _labels(route=route, method=method, le='+Inf')
+                lines.append(f'http_request_duration_seconds_bucket{labels} {metrics.count}')
+                labels = _labels(route=route, method=method)
+                lines.append(f'http_request_duration_seconds_sum{labels} {metrics.seconds:.6f}')
+                lines.append(f'http_request_duration_seconds_count{labels} {metrics.count}')
+
+            lines += ['# HELP http_requests_total Responses by status', '# TYPE http_requests_total counter']
+            for (route, method, status), count in responses:
+                lines.append(f'http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+            totals = [
+                ('http_request_view_seconds_total', 'Time spent in views, including their queries', 'view_seconds'),
+                ('http_request_db_seconds_total', 'Time spent running SQL', 'db_seconds'),
+                ('http_request_serialization_seconds_total', 'Time spent rendering or streaming response bodies',
+                 'serialization_seconds'),
+                ('http_request_db_queries_total', 'SQL statements run', 'queries'),
+                ('http_response_size_bytes_total', 'Response body bytes sent', 'response_bytes'),
+            ]
+            for name, help_text, field in totals:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (route, method), metrics in routes:
+                    value = getattr(metrics, field)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{_labels(route=route, method=method)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(settings.REQUEST_METRICS_BUCKETS)
+
+
+class RequestMetricsMiddleware:
+    """Times each request and records it in the registry; listed first so the total covers every other middleware"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.request_timing = RequestTiming()
+        with count_queries(timing):
+            response = self.get_response(request)
+        timing.finished = time.perf_counter()
+        if timing.view_started is not None and timing.view_finished is None:
+            # Plain HttpResponses are finished when the view returns them
+            timing.view_finished = timing.finished
+
+        if response.streaming and not response.is_async:
+            # The body is produced after this returns, so the header only covers the work done so far
+            response['Server-Timing'] = timing.server_timing()
+            content = response.streaming_content
+            response.streaming_content = self._stream(content, request, response, timing)
+            return response
+
+        timing.size = len(response.content)
+        response['Server-Timing'] = timing.server_timing()
+        self._record(request, response, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.request_timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after every middleware has seen them
+        timing = request.request_timing
+        timing.view_finished = time.perf_counter()
+        response.add_post_render_callback(lambda rendered: setattr(timing, 'rendered', time.perf_counter()))
+        return response
+
+    def _stream(self, content, request, response, timing):
+        started = time.perf_counter()
+        db_before = timing.db_seconds
+        try:
+            with count_queries(timing):
+                for chunk in content:
+                    timing.size += len(chunk)
+                    yield chunk
+        finally:
+            timing.finished = time.perf_counter()
+            timing.stream_seconds = timing.finished - started - (timing.db_seconds - db_before)
+            self._record(request, response, timing)
+
+    def _record(self, request, response, timing):
+        match = request.resolver_match
+        route = match.view_name if match is not None else UNMATCHED_ROUTE
+        registry.observe(route, request.method, response.status_code, timing)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; 404 unless metrics are enabled.
+
+    Needs the REQUEST_METRICS_TOKEN bearer token, or, while no token is set,
+    a staff user's session; it is never public.
+    """
+    if not settings.REQUEST_METRICS_ENABLED:
+        raise Http404
+    token = settings.REQUEST_METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='columns_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
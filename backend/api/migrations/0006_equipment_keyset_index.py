@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_dataset_columns_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'id'], name='equipment_dataset_id_idx'),
+        ),
+    ]
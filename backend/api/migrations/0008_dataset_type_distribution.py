@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:40
+
+import os
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_type_distribution(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    Equipment = apps.get_model('api', 'Equipment')
+    for dataset in Dataset.objects.filter(total_count__gt=0).iterator():
+        rows = (
+            Equipment.objects.filter(dataset_id=dataset.id)
+            .values('equipment_type')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'equipment_type')
+        )
+        distribution = [{'equipment_type': row['equipment_type'], 'count': row['count']} for row in rows]
+        if not distribution and dataset.columns_path and os.path.isdir(dataset.columns_path):
+            # Store-only datasets (STORE_EQUIPMENT_ROWS off); the model-free reader is safe to use here
+            from api.columnar import ColumnStore
+            distribution = [
+                {'equipment_type': t, 'count': count}
+                for t, count in ColumnStore(dataset.columns_path).type_counts()
+            ]
+        dataset.type_distribution = distribution
+        dataset.save(update_fields=['type_distribution'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_equipment_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='type_distribution',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_type_distribution, migrations.RunPython.noop),
+    ]
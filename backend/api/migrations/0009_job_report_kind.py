@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_dataset_type_distribution'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest', 'CSV ingestion'), ('report', 'PDF report')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_job_report_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='statistics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
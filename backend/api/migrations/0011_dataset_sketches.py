@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_dataset_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='sketches',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
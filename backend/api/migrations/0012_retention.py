@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:06
+
+import os
+from django.db import migrations, models
+
+
+def backfill_size_bytes(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for dataset in Dataset.objects.only('id', 'file_path').iterator():
+        if dataset.file_path and os.path.exists(dataset.file_path):
+            Dataset.objects.filter(pk=dataset.pk).update(size_bytes=os.path.getsize(dataset.file_path))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_dataset_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='size_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest', 'CSV ingestion'), ('report', 'PDF report'), ('retention', 'Retention')], max_length=20),
+        ),
+        migrations.RunPython(backfill_size_bytes, migrations.RunPython.noop),
+    ]
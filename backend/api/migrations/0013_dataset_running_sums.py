@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+
+def backfill_sums(apps, schema_editor):
+    Dataset = apps.get_model('api', 'Dataset')
+    for param in PARAMETERS:
+        Dataset.objects.filter(**{f'avg_{param}__isnull': False}).update(
+            **{f'sum_{param}': F(f'avg_{param}') * F('total_count')}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='sum_flowrate',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='sum_pressure',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='sum_temperature',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_sums, migrations.RunPython.noop),
+    ]
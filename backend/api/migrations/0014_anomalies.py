@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_dataset_running_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='anomaly_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Anomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.IntegerField()),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('equipment_type', models.CharField(max_length=100)),
+                ('parameter', models.CharField(max_length=20)),
+                ('value', models.FloatField()),
+                ('zscore', models.FloatField(blank=True, null=True)),
+                ('by_zscore', models.BooleanField(default=False)),
+                ('by_iqr', models.BooleanField(default=False)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='api.dataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'id'], name='anomaly_dataset_id_idx'), models.Index(fields=['dataset', 'parameter', 'id'], name='anomaly_dataset_param_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_anomalies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='rejected_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
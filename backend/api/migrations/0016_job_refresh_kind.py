@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_dataset_rejected_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest', 'CSV ingestion'), ('report', 'PDF report'), ('retention', 'Retention'), ('refresh', 'Statistics and anomalies refresh')], max_length=20),
+        ),
+    ]
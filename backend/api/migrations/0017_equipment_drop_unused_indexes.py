@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_job_refresh_kind'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='equipment',
+            name='equipment_dataset_flow_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipment',
+            name='equipment_dataset_press_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipment',
+            name='equipment_dataset_temp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipment',
+            name='equipment_dataset_name_idx',
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='dataset',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='api.dataset'),
+        ),
+    ]
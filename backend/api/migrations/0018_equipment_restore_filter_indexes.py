@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_equipment_drop_unused_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'flowrate', 'id'], name='equipment_dataset_flow_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'pressure', 'id'], name='equipment_dataset_press_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'temperature', 'id'], name='equipment_dataset_temp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'equipment_name', 'id'], name='equipment_dataset_name_idx', opclasses=['', 'varchar_pattern_ops', '']),
+        ),
+    ]
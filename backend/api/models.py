@@ -1,12 +1,37 @@
-from django.db import models
+import uuid
+from django.db import connection, models
 from django.contrib.auth.models import User
 
 
+class DatasetQuerySet(models.QuerySet):
+    def ready(self):
+        """Datasets whose background ingestion, if any, has finished"""
+        ingesting = Job.objects.filter(kind=Job.KIND_INGEST, state__in=Job.PENDING_STATES, dataset__isnull=False)
+        return self.exclude(pk__in=ingesting.values('dataset_id'))
+
+    def lock(self, pk):
+        """The dataset re-read under a row lock held until the transaction ends; call inside atomic().
+
+        SQLite ignores FOR UPDATE and fails a transaction that reads before it
+        writes at once while another connection is writing, so there a no-op
+        UPDATE first takes its database-wide write lock, waiting like any write.
+        """
+        if not connection.features.has_select_for_update:
+            self.filter(pk=pk).update(updated_at=models.F('updated_at'))
+        return self.select_for_update().get(pk=pk)
+
+
 class Dataset(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='datasets')
     name = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Set when rows are appended; cached responses and reports are keyed on it
+    updated_at = models.DateTimeField(null=True, blank=True)
     file_path = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    columns_path = models.CharField(max_length=500, blank=True)
+    # Size of the uploaded CSV, counted against RETENTION_MAX_BYTES_PER_USER
+    size_bytes = models.BigIntegerField(default=0)
     
     total_count = models.IntegerField(default=0)
     avg_flowrate = models.FloatField(null=True, blank=True)
@@ -18,6 +43,22 @@ class Dataset(models.Model):
     max_pressure = models.FloatField(null=True, blank=True)
     min_temperature = models.FloatField(null=True, blank=True)
     max_temperature = models.FloatField(null=True, blank=True)
+    # Running sums behind the averages, so appended rows update them without a rescan
+    sum_flowrate = models.FloatField(default=0.0)
+    sum_pressure = models.FloatField(default=0.0)
+    sum_temperature = models.FloatField(default=0.0)
+    # [{'equipment_type', 'count'}] largest first, computed at ingestion
+    type_distribution = models.JSONField(default=list, blank=True)
+    # Std, percentiles, histograms and per-type figures; see api.statistics
+    statistics = models.JSONField(default=dict, blank=True)
+    # Serialized api.sketches.DatasetSketch; mergeable with sketches of appended rows
+    sketches = models.JSONField(default=dict, blank=True)
+    # Rows the upload schema rejected; reasons are in the rejection report (see api.schema)
+    rejected_count = models.IntegerField(default=0)
+    # Rows in the anomalies table; None until detection has run (see api.anomalies)
+    anomaly_count = models.IntegerField(null=True, blank=True)
+    
+    objects = DatasetQuerySet.as_manager()
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -27,12 +68,113 @@ class Dataset(models.Model):
 
 
 class Equipment(models.Model):
-    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='equipment')
+    # Lookups by dataset use the (dataset, id) index below; a separate one would only slow inserts
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='equipment', db_index=False)
     equipment_name = models.CharField(max_length=255)
     equipment_type = models.CharField(max_length=100)
     flowrate = models.FloatField()
     pressure = models.FloatField()
     temperature = models.FloatField()
     
+    class Meta:
+        # Every listing is scoped to one dataset and pages in (sort column, id) order, so each
+        # filter, sort and prefix search reads a range of one of these
+        indexes = [
+            models.Index(fields=['dataset', 'id'], name='equipment_dataset_id_idx'),
+            models.Index(fields=['dataset', 'equipment_type', 'id'], name='equipment_dataset_type_idx'),
+            models.Index(fields=['dataset', 'flowrate', 'id'], name='equipment_dataset_flow_idx'),
+            models.Index(fields=['dataset', 'pressure', 'id'], name='equipment_dataset_press_idx'),
+            models.Index(fields=['dataset', 'temperature', 'id'], name='equipment_dataset_temp_idx'),
+            # varchar_pattern_ops lets PostgreSQL use the index for name prefix search; ignored elsewhere
+            models.Index(
+                fields=['dataset', 'equipment_name', 'id'],
+                name='equipment_dataset_name_idx',
+                opclasses=['', 'varchar_pattern_ops', ''],
+            ),
+        ]
+    
     def __str__(self):
         return self.equipment_name
+
+
+class Anomaly(models.Model):
+    """A parameter value that is an outlier among the rows of its equipment type"""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='anomalies')
+    # 1-based position in the dataset, the id /equipment/ reports for column store rows
+    row = models.IntegerField()
+    equipment_name = models.CharField(max_length=255)
+    equipment_type = models.CharField(max_length=100)
+    parameter = models.CharField(max_length=20)
+    value = models.FloatField()
+    zscore = models.FloatField(null=True, blank=True)
+    by_zscore = models.BooleanField(default=False)
+    by_iqr = models.BooleanField(default=False)
+    
+    class Meta:
+        # Flags are inserted in row order, so id order is row order
+        indexes = [
+            models.Index(fields=['dataset', 'id'], name='anomaly_dataset_id_idx'),
+            models.Index(fields=['dataset', 'parameter', 'id'], name='anomaly_dataset_param_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_name} {self.parameter}={self.value}"
+
+
+class Job(models.Model):
+    KIND_INGEST = 'ingest'
+    KIND_REPORT = 'report'
+    KIND_RETENTION = 'retention'
+    KIND_REFRESH = 'refresh'
+    KIND_CHOICES = [
+        (KIND_INGEST, 'CSV ingestion'),
+        (KIND_REPORT, 'PDF report'),
+        (KIND_RETENTION, 'Retention'),
+        (KIND_REFRESH, 'Statistics and anomalies refresh'),
+    ]
+    
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_QUEUED, 'Queued'),
+        (STATE_RUNNING, 'Running'),
+        (STATE_DONE, 'Done'),
+        (STATE_FAILED, 'Failed'),
+    ]
+    PENDING_STATES = (STATE_QUEUED, STATE_RUNNING)
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=STATE_QUEUED, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    rows_processed = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.state})"
+
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    file_path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+    
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
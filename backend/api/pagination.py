@@ -0,0 +1,42 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+class EquipmentCursorPagination(CursorPagination):
+    """Keyset pagination over a dataset's Equipment rows"""
+    page_size = settings.EQUIPMENT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.EQUIPMENT_MAX_PAGE_SIZE
+    ordering = 'id'
+
+
+class AnomalyCursorPagination(EquipmentCursorPagination):
+    """Keyset pagination over a dataset's flagged values, which are stored in row order"""
+
+
+class ColumnStorePagination(EquipmentCursorPagination):
+    """The same cursor links, with positions that are row numbers in a column store"""
+    
+    def paginate_store(self, store, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        
+        cursor = self.decode_cursor(request)
+        self.start = int(cursor.position) if cursor and cursor.position else 0
+        self.page = store.records(self.start, self.start + self.page_size)
+        self.stop = self.start + len(self.page)
+        self.has_next = self.stop < store.rows
+        self.has_previous = self.start > 0
+        return self.page
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=str(self.stop)))
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = max(0, self.start - self.page_size)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
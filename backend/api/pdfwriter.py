@@ -0,0 +1,90 @@
+"""A ReportLab canvas that writes each page to disk as soon as it is finished.
+
+ReportLab keeps every page of a document in memory and assembles the whole
+file in save(), so memory grows with the page count. StreamingCanvas writes
+each page's compressed content and page object out in showPage() and only
+keeps their object numbers; save() then writes the page tree, catalog and
+cross-reference table. It covers what the reports draw (text in the standard
+fonts, lines, rectangles and colours) and raises on anything that needs more
+shared objects (images, forms, links, transparency, embedded fonts).
+"""
+import re
+import zlib
+from reportlab.pdfgen.canvas import Canvas
+
+
+PDF_HEADER = b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n'
+# Objects 1 and 2 are written last, once every page is known
+CATALOG_OBJECT = 1
+PAGES_OBJECT = 2
+REFERENCE = re.compile(rb'\b\d+ \d+ R\b')
+
+
+class StreamingCanvas(Canvas):
+    """Canvas whose memory use does not grow with the number of pages; see the module docstring"""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._out = open(filename, 'wb')
+        self._out.write(PDF_HEADER)
+        self._offsets = {}
+        self._next_object = PAGES_OBJECT + 1
+        self._page_objects = []
+        # ReportLab font name (/F1 ...) -> our object number
+        self._font_objects = {}
+
+    def _write_object(self, body, number=None):
+        if number is None:
+            number = self._next_object
+            self._next_object += 1
+        self._offsets[number] = self._out.tell()
+        self._out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+        return number
+
+    def _write_fonts(self):
+        for base_name, internal_name in self._doc.fontMapping.items():
+            if internal_name in self._font_objects:
+                continue
+            body = self._doc.idToObject[internal_name[1:]].format(self._doc)
+            if REFERENCE.search(body):
+                raise ValueError(f'StreamingCanvas only supports the standard PDF fonts, not {base_name}')
+            self._font_objects[internal_name] = self._write_object(body)
+
+    def showPage(self):
+        if self._formsinuse or self._annotationrefs or self._extgstate.getState() or self._cropMarks:
+            raise ValueError('StreamingCanvas only draws text, lines, shapes and colours')
+        content = zlib.compress(('\n'.join([self._preamble] + self._code) + '\n').encode('utf-8'))
+        contents = self._write_object(
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream'
+        )
+        self._write_fonts()
+        fonts = ' '.join(f'{name} {number} 0 R' for name, number in self._font_objects.items())
+        width, height = self._pagesize
+        page = (
+            f'<< /Type /Page /Parent {PAGES_OBJECT} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] '
+            f'/Resources << /Font << {fonts} >> /ProcSet [/PDF /Text] >> /Contents {contents} 0 R >>'
+        )
+        self._page_objects.append(self._write_object(page.encode('latin-1')))
+
+        if self._onPage:
+            self._onPage(self._pageNumber)
+        self._startPage()
+
+    def save(self):
+        if len(self._code):
+            self.showPage()
+        kids = ' '.join(f'{number} 0 R' for number in self._page_objects)
+        self._write_object(
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objects)} >>'.encode('latin-1'), PAGES_OBJECT
+        )
+        self._write_object(f'<< /Type /Catalog /Pages {PAGES_OBJECT} 0 R >>'.encode('latin-1'), CATALOG_OBJECT)
+
+        xref_offset = self._out.tell()
+        count = self._next_object
+        self._out.write(b'xref\n0 %d\n0000000000 65535 f \n' % count)
+        for number in range(1, count):
+            self._out.write(b'%010d 00000 n \n' % self._offsets[number])
+        self._out.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            count, CATALOG_OBJECT, xref_offset
+        ))
+        self._out.close()
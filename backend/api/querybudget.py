@@ -0,0 +1,100 @@
+"""Query budgets for the API's hot endpoints.
+
+query_budget() fails a block that runs more SQL than allowed, and
+check_endpoint_budgets() runs every endpoint in ENDPOINT_BUDGETS through a
+test client. check_budget_growth() also checks that no endpoint's query count
+grows with the number of datasets (an N+1). api.tests.test_query_budgets runs
+them with the test suite; `manage.py check_query_budgets` runs them against
+the configured database.
+"""
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from .models import Dataset
+from .bulk import insert_equipment
+from .ingest import RunningStats, apply_stats
+from .statistics import dataset_statistics
+from .anomalies import detect_anomalies
+
+TYPES = ['Pump', 'Valve', 'Reactor', 'Compressor']
+
+
+# (label, URL template, maximum queries); {id} is a dataset id
+ENDPOINT_BUDGETS = [
+    ('dataset list', '/api/datasets/', 1),
+    ('dataset detail', '/api/datasets/{id}/', 1),
+    ('dataset summary', '/api/datasets/{id}/summary/', 1),
+    ('dataset statistics', '/api/datasets/{id}/statistics/', 1),
+    ('dataset comparison', '/api/datasets/compare/?ids={id}', 1),
+    ('equipment page', '/api/datasets/{id}/equipment/?page_size=50', 2),
+    ('equipment filtered', '/api/datasets/{id}/equipment/?type=Pump&ordering=-flowrate', 2),
+    ('anomalies page', '/api/datasets/{id}/anomalies/?page_size=50', 2),
+]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block runs more queries than its budget"""
+
+
+@contextmanager
+def query_budget(limit, label='block', using=DEFAULT_DB_ALIAS):
+    """Fail with the captured SQL when the body runs more than limit queries"""
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > limit:
+        statements = '\n'.join(f'  {query["sql"]}' for query in context.captured_queries)
+        raise QueryBudgetExceeded(f'{label}: {len(context)} queries, budget {limit}\n{statements}')
+
+
+def check_endpoint_budgets(client, dataset_id, budgets=ENDPOINT_BUDGETS):
+    """GET every endpoint once and return [(label, queries, limit)]; raises on the first overrun"""
+    results = []
+    for label, url, limit in budgets:
+        with query_budget(limit, label) as context:
+            response = client.get(url.format(id=dataset_id))
+            # Streaming bodies run their queries while being consumed
+            b''.join(response.streaming_content) if response.streaming else response.content
+        if response.status_code != 200:
+            raise QueryBudgetExceeded(f'{label}: expected 200, got {response.status_code}')
+        results.append((label, len(context), limit))
+    return results
+
+
+def make_budget_dataset(user, index, rows):
+    """A dataset of rows Equipment rows with its statistics and anomalies stored, as after an upload"""
+    rng = np.random.default_rng(index)
+    chunk = pd.DataFrame({
+        'equipment_name': [f'EQ-{index}-{i}' for i in range(rows)],
+        'equipment_type': [TYPES[i % len(TYPES)] for i in range(rows)],
+        'flowrate': rng.normal(100, 10, rows),
+        'pressure': rng.normal(5, 1, rows),
+        'temperature': rng.normal(80, 5, rows),
+    })
+    dataset = Dataset.objects.create(user=user, name=f'budget-{index}.csv', file_path='')
+    insert_equipment(dataset.id, chunk)
+    stats = RunningStats()
+    stats.update(chunk)
+    # Like ingestion, store statistics up front so endpoints are measured in their steady state
+    dataset.statistics = dataset_statistics(dataset, stats.sketch)
+    dataset.anomaly_count = detect_anomalies(dataset, statistics=dataset.statistics, sketch=stats.sketch)
+    apply_stats(dataset, stats)
+    return dataset
+
+
+def check_budget_growth(client, user, dataset_count=20, rows=200):
+    """[(label, queries with 1 dataset, queries with dataset_count, limit)] for the user behind client.
+
+    Raises QueryBudgetExceeded when an endpoint overruns its budget; callers
+    compare the two counts to catch queries that grow with the datasets.
+    """
+    dataset = make_budget_dataset(user, 0, rows)
+    single = check_endpoint_budgets(client, dataset.id)
+    for index in range(1, dataset_count):
+        make_budget_dataset(user, index, rows)
+    many = check_endpoint_budgets(client, dataset.id)
+    return [
+        (label, before, after, limit)
+        for (label, before, limit), (_, after, _) in zip(single, many)
+    ]
@@ -0,0 +1,36 @@
+import json
+from rest_framework.renderers import BaseRenderer
+from .wire import MEDIA_TYPE, ColumnarFrame, encode
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON. Row streams bypass render(); it only formats errors and single objects"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """text/csv. Row streams bypass render(); anything else (e.g. errors) is written as JSON text"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str)
+
+
+class ColumnarRenderer(BaseRenderer):
+    """Binary columnar payload (see api.wire); non-tabular data travels in the header only"""
+    media_type = MEDIA_TYPE
+    format = 'columnar'
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, ColumnarFrame):
+            return encode(data)
+        return encode(meta=data)
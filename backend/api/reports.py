@@ -0,0 +1,91 @@
+import os
+import uuid
+from django.conf import settings
+from .caching import dataset_version
+
+
+# Rendered reports are cached as <REPORTS_DIR>/report_<dataset>_<version>_<variant>_t<template>.pdf
+REPORTS_DIR = 'media/reports'
+
+
+def report_path(dataset, variant, template_version):
+    version = int(dataset_version(dataset).timestamp() * 1_000_000)
+    return os.path.join(REPORTS_DIR, f'report_{dataset.id}_{version}_{variant}_t{template_version}.pdf')
+
+
+def find_cached_report(dataset, variant, template_version):
+    """Path of a cached report, or None. A hit refreshes the file's mtime, which is what eviction orders by"""
+    path = report_path(dataset, variant, template_version)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def get_cached_report(dataset, variant, template_version, render):
+    """Path of the dataset's report, calling render(path) only when no cached copy exists"""
+    path = find_cached_report(dataset, variant, template_version)
+    if path:
+        return path
+    path = report_path(dataset, variant, template_version)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    temp_path = f'{path}.tmp-{uuid.uuid4().hex}'
+    try:
+        render(temp_path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    evict_reports(keep=path)
+    return path
+
+
+def evict_reports(keep=None, max_bytes=None, max_files=None):
+    """Delete least recently used reports until the directory is within its size and count limits"""
+    max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_files = settings.REPORT_CACHE_MAX_FILES if max_files is None else max_files
+    if not os.path.isdir(REPORTS_DIR):
+        return 0
+
+    reports = []
+    for entry in os.scandir(REPORTS_DIR):
+        if entry.is_file() and entry.name.endswith('.pdf'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            reports.append((stat.st_mtime, stat.st_size, entry.path))
+    reports.sort()
+
+    total_bytes = sum(size for _, size, _ in reports)
+    count = len(reports)
+    removed = 0
+    for _, size, path in reports:
+        if total_bytes <= max_bytes and count <= max_files:
+            break
+        if keep and os.path.samefile(path, keep):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        count -= 1
+        removed += 1
+    return removed
+
+
+def remove_reports(dataset_id):
+    """Drop every cached report of a deleted dataset"""
+    if not os.path.isdir(REPORTS_DIR):
+        return
+    prefix = f'report_{dataset_id}_'
+    for entry in os.scandir(REPORTS_DIR):
+        if entry.name.startswith(prefix):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset, Job
+from .ingest import remove_upload_if_unused
+from .columnar import remove_store_if_unused
+from .reports import remove_reports
+from .schema import remove_rejections
+
+
+def expired_dataset_ids(user, max_datasets=None, max_age_days=None, max_bytes=None):
+    """Ids of the user's datasets past any retention limit; the newest dataset is always kept.
+
+    Limits default to the RETENTION_* settings; 0 disables a limit.
+    """
+    max_datasets = settings.RETENTION_MAX_DATASETS if max_datasets is None else max_datasets
+    max_age_days = settings.RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = settings.RETENTION_MAX_BYTES_PER_USER if max_bytes is None else max_bytes
+    cutoff = timezone.now() - timedelta(days=max_age_days) if max_age_days else None
+
+    rows = Dataset.objects.ready().filter(user=user).order_by('-uploaded_at').values_list(
+        'id', 'uploaded_at', 'size_bytes'
+    )
+    expired = []
+    kept_bytes = 0
+    for position, (dataset_id, uploaded_at, size_bytes) in enumerate(rows):
+        if position > 0 and (
+            (max_datasets and position >= max_datasets)
+            or (cutoff and uploaded_at < cutoff)
+            or (max_bytes and kept_bytes + size_bytes > max_bytes)
+        ):
+            expired.append(dataset_id)
+        else:
+            kept_bytes += size_bytes
+    return expired
+
+
+def delete_datasets(dataset_ids):
+    """Delete datasets with one DELETE per table, then release files nothing else uses"""
+    if not dataset_ids:
+        return 0
+    paths = list(Dataset.objects.filter(id__in=dataset_ids).values_list('file_path', 'columns_path'))
+    with transaction.atomic():
+        # Equipment and Anomaly have no dependents, so each cascade is a single fast DELETE ... WHERE dataset_id IN
+        deleted = Dataset.objects.filter(id__in=dataset_ids).delete()[1].get(Dataset._meta.label, 0)
+    for file_path in {file_path for file_path, _ in paths}:
+        remove_upload_if_unused(file_path)
+    for columns_path in {columns_path for _, columns_path in paths}:
+        remove_store_if_unused(columns_path)
+    for dataset_id in dataset_ids:
+        remove_reports(dataset_id)
+        remove_rejections(dataset_id)
+    return deleted
+
+
+def enforce_retention(user):
+    """Delete the user's datasets that are past a retention limit and return how many went"""
+    return delete_datasets(expired_dataset_ids(user))
+
+
+def schedule_retention(user):
+    """Run retention for the user in the background, unless a run is still waiting to start.
+
+    A running job may already have listed the user's datasets without the
+    newest one, so only a queued job makes another unnecessary.
+    """
+    from .jobs import enqueue
+    waiting = Job.objects.filter(user=user, kind=Job.KIND_RETENTION, state=Job.STATE_QUEUED).exists()
+    if not waiting:
+        enqueue(user, Job.KIND_RETENTION)
@@ -0,0 +1,284 @@
+import csv
+import os
+from itertools import islice
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from .models import Equipment
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_compute = pa_csv = None
+
+
+# Row-level rejections are kept as <REJECTIONS_DIR>/dataset_<id>.csv
+REJECTIONS_DIR = 'media/rejections'
+REJECTION_COLUMNS = ['file', 'row', 'column', 'value', 'reason']
+# Rejection reasons quoted in the error when an upload is refused, and how much of each value
+REJECTION_EXAMPLES = 5
+REJECTION_EXAMPLE_CHARS = 40
+# pyarrow reads blocks of bytes, not rows; this turns INGEST_CHUNK_SIZE into a block size
+ARROW_BYTES_PER_ROW = 64
+
+# Raised by the parsers for rows they cannot split into fields
+PARSE_ERRORS = (pd.errors.ParserError,) + ((pa.ArrowInvalid,) if pa is not None else ())
+
+
+class CSVValidationError(ValueError):
+    """Raised when an uploaded CSV does not match the expected layout"""
+
+
+class TextColumn:
+    """A required string column, at most as long as its Equipment field"""
+
+    def __init__(self, header, field):
+        self.header = header
+        self.field = field
+        self.max_length = Equipment._meta.get_field(field).max_length
+
+    def coerce(self, values):
+        """(values, [(reason, mask), ...]); a bad value gets the first reason whose mask covers it"""
+        missing = values.isna().to_numpy()
+        text = values.fillna('') if missing.any() else values
+        strings = text.to_numpy()
+        # Plain map() over the objects is several times faster than the .str accessor
+        blank = np.fromiter(map(str.isspace, strings), dtype=bool, count=len(strings))
+        checks = [('missing', missing | blank)]
+        if len(strings) and max(map(len, strings)) > self.max_length:
+            lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+            checks.append((f'longer than {self.max_length} characters', lengths > self.max_length))
+        return text, checks
+
+
+class NumberColumn:
+    """A required, finite float column"""
+
+    def __init__(self, header, field):
+        self.header = header
+        self.field = field
+
+    def coerce(self, values):
+        """(values, [(reason, mask), ...]); a bad value gets the first reason whose mask covers it"""
+        missing = values.isna().to_numpy()
+        if values.dtype.kind in 'fiu':
+            # The parser already read every value in this chunk as a number
+            numbers = values.astype(np.float64)
+        else:
+            # Some value did not parse; coerce the chunk's text and flag what stays NaN
+            text = values.where(missing, values.astype(str))
+            numbers = pd.to_numeric(text, errors='coerce').astype(np.float64)
+        parsed = numbers.to_numpy()
+        return numbers, [
+            ('missing', missing),
+            ('not a number', ~missing & np.isnan(parsed)),
+            ('not finite', np.isinf(parsed)),
+        ]
+
+
+# CSV header -> Equipment field, with each column's type and rules
+EQUIPMENT_SCHEMA = [
+    TextColumn('Equipment Name', 'equipment_name'),
+    TextColumn('Type', 'equipment_type'),
+    NumberColumn('Flowrate', 'flowrate'),
+    NumberColumn('Pressure', 'pressure'),
+    NumberColumn('Temperature', 'temperature'),
+]
+SCHEMA_HEADERS = [column.header for column in EQUIPMENT_SCHEMA]
+TEXT_HEADERS = [column.header for column in EQUIPMENT_SCHEMA if isinstance(column, TextColumn)]
+NUMBER_HEADERS = [column.header for column in EQUIPMENT_SCHEMA if isinstance(column, NumberColumn)]
+
+
+def csv_engine():
+    """'pyarrow' when CSV_ENGINE allows it and pyarrow is installed, otherwise pandas' 'c' parser"""
+    if settings.CSV_ENGINE in ('auto', 'pyarrow') and pa_csv is not None:
+        return 'pyarrow'
+    return 'c'
+
+
+def _arrow_frame(batch):
+    """Batch of text columns as a DataFrame, with number columns cast to float64 where every value parses"""
+    columns = {}
+    for header in SCHEMA_HEADERS:
+        values = batch.column(header)
+        if header in NUMBER_HEADERS:
+            try:
+                values = pa_compute.cast(values, pa.float64())
+            except pa.ArrowInvalid:
+                pass
+        columns[header] = values.to_pandas()
+    return pd.DataFrame(columns)
+
+
+def _c_reader(file_path, chunk_size, number_dtype):
+    """Chunks from pandas' C parser, refusing rows with more fields than the header as pyarrow does.
+
+    With usecols the C parser drops such fields without a word, so the csv
+    module counts every row's fields alongside it (pandas skips blank lines,
+    and so does the count). Costs about as much again as the parse itself.
+    """
+    dtype = {header: str for header in TEXT_HEADERS}
+    dtype.update({header: number_dtype for header in NUMBER_HEADERS})
+    chunks = pd.read_csv(file_path, engine='c', usecols=SCHEMA_HEADERS, dtype=dtype, chunksize=chunk_size)
+    # Decoding errors are left to the parser to report
+    with chunks, open(file_path, newline='', encoding='utf-8', errors='replace') as f:
+        records = filter(None, csv.reader(f))
+        width = len(next(records, []))
+        seen = 0
+        for chunk in chunks:
+            widths = np.fromiter(map(len, islice(records, len(chunk))), dtype=np.int64)
+            wide = np.flatnonzero(widths > width)
+            if len(wide):
+                raise pd.errors.ParserError(
+                    f'Expected {width} fields in row {seen + wide[0] + 1}, saw {widths[wide[0]]}'
+                )
+            seen += len(chunk)
+            yield chunk
+
+
+def read_raw_chunks(file_path, chunk_size, engine=None):
+    """Yield DataFrames of the schema's columns, text columns as str and number columns as float64.
+
+    When a number column does not parse, it comes back as text instead, for
+    NumberColumn.coerce to sort out value by value: pyarrow falls back for
+    that batch only, the C parser for the rest of the file. Empty and NA
+    fields are None/NaN.
+    """
+    if (engine or csv_engine()) == 'pyarrow':
+        read_options = pa_csv.ReadOptions(block_size=max(chunk_size * ARROW_BYTES_PER_ROW, 1 << 20))
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=SCHEMA_HEADERS,
+            column_types={header: pa.string() for header in SCHEMA_HEADERS},
+            strings_can_be_null=True,
+        )
+        reader = pa_csv.open_csv(file_path, read_options=read_options, convert_options=convert_options)
+        for batch in reader:
+            yield _arrow_frame(batch)
+        return
+
+    yielded = 0
+    try:
+        for chunk in _c_reader(file_path, chunk_size, np.float64):
+            yield chunk
+            yielded += len(chunk)
+        return
+    except PARSE_ERRORS:
+        raise
+    except ValueError:
+        # A value in the next chunk is not a number; that chunk's rows were consumed with the error
+        pass
+    skip = yielded
+    for chunk in _c_reader(file_path, chunk_size, str):
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield chunk.iloc[skip:]
+        skip = 0
+
+
+def coerce_chunk(raw, first_row):
+    """Apply the schema to a chunk of raw strings.
+
+    Returns (rows, rejections): the valid rows with Equipment field names as
+    columns and parsed dtypes, and one rejection per bad value. Row numbers
+    are 1-based data rows; first_row is the number of rows before this chunk.
+    """
+    columns = {}
+    problems = []
+    rejected = np.zeros(len(raw), dtype=bool)
+    for column in EQUIPMENT_SCHEMA:
+        values, checks = column.coerce(raw[column.header])
+        columns[column.field] = values.to_numpy()
+        flagged = np.zeros(len(raw), dtype=bool)
+        for reason, mask in checks:
+            if not mask.any():
+                continue
+            bad = np.flatnonzero(mask & ~flagged)
+            flagged[bad] = True
+            problems.append(pd.DataFrame({
+                'row': first_row + bad + 1,
+                'column': column.header,
+                'value': raw[column.header].to_numpy()[bad],
+                'reason': reason,
+            }))
+        rejected |= flagged
+
+    rows = pd.DataFrame(columns)
+    if not rejected.any():
+        return rows, None
+    # One entry per bad value, in row order and schema column order within a row
+    order = {column.header: i for i, column in enumerate(EQUIPMENT_SCHEMA)}
+    rejections = pd.concat(problems, ignore_index=True)
+    rejections = rejections.iloc[np.lexsort((rejections['column'].map(order), rejections['row']))]
+    return rows[~rejected].reset_index(drop=True), rejections
+
+
+def rejections_path(dataset_id):
+    return os.path.join(REJECTIONS_DIR, f'dataset_{dataset_id}.csv')
+
+
+class RejectionLog:
+    """Rejected values of one upload, appended to the dataset's rejection report as they are found.
+
+    discard() undoes everything this log wrote, so a failed upload or append
+    leaves the report as it was.
+    """
+
+    def __init__(self, dataset_id, source):
+        self.path = rejections_path(dataset_id)
+        self.source = source
+        self.rows = 0
+        self.examples = []
+        self._file = None
+        self._start = None
+
+    def add(self, rejections):
+        if rejections is None or rejections.empty:
+            return
+        if self._file is None:
+            os.makedirs(REJECTIONS_DIR, exist_ok=True)
+            self._start = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            self._file = open(self.path, 'a', newline='', encoding='utf-8')
+            if self._start == 0:
+                csv.writer(self._file).writerow(REJECTION_COLUMNS)
+        # The csv module's header ends in \r\n, so the rows must too
+        rejections.assign(file=self.source).to_csv(
+            self._file, columns=REJECTION_COLUMNS, header=False, index=False, lineterminator='\r\n'
+        )
+        self.rows += rejections['row'].nunique()
+        for row, column, value, reason in rejections[['row', 'column', 'value', 'reason']].head(
+            REJECTION_EXAMPLES - len(self.examples)
+        ).itertuples(index=False):
+            quoted = '' if pd.isna(value) else f' ({str(value)[:REJECTION_EXAMPLE_CHARS]!r})'
+            self.examples.append(f'row {row}, {column}: {reason}{quoted}')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        if self._start is None:
+            return
+        if self._start:
+            os.truncate(self.path, self._start)
+        else:
+            os.remove(self.path)
+        self._start = None
+
+    def check(self, accepted):
+        """Refuse the upload when too large a share of its rows was rejected"""
+        total = accepted + self.rows
+        if self.rows and (not accepted or self.rows / total > settings.INGEST_MAX_REJECTED_FRACTION):
+            raise CSVValidationError(
+                f'{self.rows} of {total} rows were rejected; ' + '; '.join(self.examples)
+            )
+
+
+def remove_rejections(dataset_id):
+    path = rejections_path(dataset_id)
+    if os.path.exists(path):
+        os.remove(path)
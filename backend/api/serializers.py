@@ -1,6 +1,7 @@
 from rest_framework import serializers
+import os
 from django.contrib.auth.models import User
-from .models import Dataset, Equipment
+from .models import Anomaly, Dataset, Equipment, Job, UploadSession
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -25,9 +26,15 @@ class EquipmentSerializer(serializers.ModelSerializer):
         fields = ('id', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature')
 
 
-class DatasetSerializer(serializers.ModelSerializer):
-    equipment = EquipmentSerializer(many=True, read_only=True)
-    equipment_count = serializers.SerializerMethodField()
+class AnomalySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Anomaly
+        fields = ('row', 'equipment_name', 'equipment_type', 'parameter', 'value', 'zscore', 'by_zscore', 'by_iqr')
+
+
+class DatasetDetailSerializer(serializers.ModelSerializer):
+    # Stored at ingestion; kept under its old name for existing clients
+    equipment_count = serializers.IntegerField(source='total_count', read_only=True)
     
     class Meta:
         model = Dataset
@@ -37,19 +44,42 @@ class DatasetSerializer(serializers.ModelSerializer):
             'min_flowrate', 'max_flowrate',
             'min_pressure', 'max_pressure',
             'min_temperature', 'max_temperature',
-            'equipment', 'equipment_count'
+            'rejected_count', 'anomaly_count', 'equipment_count'
         )
-    
-    def get_equipment_count(self, obj):
-        return obj.equipment.count()
 
 
 class DatasetListSerializer(serializers.ModelSerializer):
-    equipment_count = serializers.SerializerMethodField()
+    equipment_count = serializers.IntegerField(source='total_count', read_only=True)
     
     class Meta:
         model = Dataset
         fields = ('id', 'name', 'uploaded_at', 'total_count', 'equipment_count')
+
+
+class JobSerializer(serializers.ModelSerializer):
+    dataset = serializers.PrimaryKeyRelatedField(read_only=True)
+    
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'kind', 'state', 'dataset', 'rows_processed', 'error',
+            'created_at', 'started_at', 'finished_at'
+        )
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'filename', 'size', 'offset', 'created_at')
+        read_only_fields = ('id', 'offset', 'created_at')
+    
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        if not value.endswith('.csv'):
+            raise serializers.ValidationError('File must be a CSV')
+        return value
     
-    def get_equipment_count(self, obj):
-        return obj.equipment.count()
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Size must be positive')
+        return value
@@ -0,0 +1,156 @@
+"""Chart-sized reductions of a dataset's columns: histograms, 2D density grids and LTTB point sets"""
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from .columnar import ColumnStore, NUMERIC_COLUMNS
+
+
+SERIES_KINDS = ['histogram', 'density', 'lttb']
+# The row position, usable as the x axis of an LTTB series
+INDEX_AXIS = 'index'
+
+
+def _int_param(params, key, default, maximum):
+    value = params.get(key)
+    if value in (None, ''):
+        return min(default, maximum)
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({key: 'Must be an integer'})
+    if value < 1:
+        raise ValidationError({key: 'Must be at least 1'})
+    return min(value, maximum)
+
+
+def _axis(params, key, default, allow_index=False):
+    value = params.get(key, default)
+    choices = NUMERIC_COLUMNS + ([INDEX_AXIS] if allow_index else [])
+    if value not in choices:
+        raise ValidationError({key: f'Must be one of: {", ".join(choices)}'})
+    return value
+
+
+class SeriesSource:
+    """Numeric columns of one dataset, optionally limited to some equipment types"""
+
+    def __init__(self, dataset, types=None):
+        self.store = ColumnStore.for_dataset(dataset)
+        self.dataset = dataset
+        self.types = types
+        self._mask = None
+        self._columns = {}
+        if self.store is None:
+            queryset = dataset.equipment.order_by('id')
+            if types:
+                queryset = queryset.filter(equipment_type__in=types)
+            rows = np.array(list(queryset.values_list(*NUMERIC_COLUMNS)), dtype=np.float64).reshape(-1, len(NUMERIC_COLUMNS))
+            self._columns = {column: rows[:, i] for i, column in enumerate(NUMERIC_COLUMNS)}
+        elif types:
+            codes = [self.store.types.index(t) for t in types if t in self.store.types]
+            self._mask = np.isin(self.store.type_codes, codes)
+
+    def column(self, name):
+        if name not in self._columns:
+            # Memory-mapped; only filtered columns are copied
+            values = self.store.column(name)
+            self._columns[name] = values[self._mask] if self._mask is not None else values
+        return self._columns[name]
+
+    @property
+    def rows(self):
+        return len(self.column(NUMERIC_COLUMNS[0]))
+
+
+def histogram_series(source, parameter, bins):
+    counts, edges = np.histogram(source.column(parameter), bins=bins) if source.rows else ([], [])
+    return {
+        'kind': 'histogram',
+        'parameter': parameter,
+        'rows': source.rows,
+        'edges': [float(edge) for edge in edges],
+        'counts': [int(count) for count in counts],
+    }
+
+
+def density_series(source, x, y, bins):
+    """bins x bins grid of row counts; only non-empty cells are listed, as [x_bin, y_bin, count]"""
+    cells = []
+    x_edges, y_edges = [], []
+    if source.rows:
+        counts, x_edges, y_edges = np.histogram2d(source.column(x), source.column(y), bins=bins)
+        x_bins, y_bins = np.nonzero(counts)
+        cells = np.column_stack([x_bins, y_bins, counts[x_bins, y_bins]]).astype(np.int64).tolist()
+    return {
+        'kind': 'density',
+        'x': x,
+        'y': y,
+        'rows': source.rows,
+        'x_edges': [float(edge) for edge in x_edges],
+        'y_edges': [float(edge) for edge in y_edges],
+        'cells': cells,
+    }
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of threshold points that keep the line's visual shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n) if threshold >= n else np.array([0, n - 1][:threshold], dtype=np.int64)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def lttb_series(source, x, y, max_points):
+    y_values = source.column(y)
+    if x == INDEX_AXIS:
+        x_values = np.arange(source.rows, dtype=np.float64)
+    else:
+        order = np.argsort(source.column(x), kind='stable')
+        x_values = np.asarray(source.column(x))[order]
+        y_values = np.asarray(y_values)[order]
+    indices = lttb_indices(x_values, y_values, max_points)
+    return {
+        'kind': 'lttb',
+        'x': x,
+        'y': y,
+        'rows': source.rows,
+        'points': np.column_stack([x_values[indices], np.asarray(y_values)[indices]]).tolist(),
+    }
+
+
+def build_series(dataset, params):
+    """Dispatch ?kind= with its parameters; every payload is bounded by ?max_points="""
+    kind = params.get('kind', 'histogram')
+    if kind not in SERIES_KINDS:
+        raise ValidationError({'kind': f'Must be one of: {", ".join(SERIES_KINDS)}'})
+    max_points = _int_param(params, 'max_points', settings.SERIES_DEFAULT_POINTS, settings.SERIES_MAX_POINTS)
+    types = [t for t in params.get('type', '').split(',') if t]
+    source = SeriesSource(dataset, types)
+
+    if kind == 'histogram':
+        bins = _int_param(params, 'bins', settings.STATISTICS_HISTOGRAM_BINS, max_points)
+        return histogram_series(source, _axis(params, 'parameter', 'flowrate'), bins)
+    if kind == 'density':
+        side = max(1, int(max_points ** 0.5))
+        bins = _int_param(params, 'bins', min(50, side), side)
+        return density_series(source, _axis(params, 'x', 'flowrate'), _axis(params, 'y', 'pressure'), bins)
+    return lttb_series(
+        source, _axis(params, 'x', INDEX_AXIS, allow_index=True), _axis(params, 'y', 'flowrate'), max_points
+    )
@@ -0,0 +1,228 @@
+"""Mergeable, fixed-size summaries that are updated one ingestion chunk at a time.
+
+KLLSketch answers quantile queries (about 1% rank error at k=200) and
+HyperLogLog estimates distinct counts (about 1.6% error at precision 12).
+Both merge losslessly with sketches built from other chunks or uploads, and
+serialize to small JSON documents stored on the dataset.
+"""
+import base64
+import math
+import zlib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from .columnar import NUMERIC_COLUMNS
+
+
+def _pack(array):
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes())).decode('ascii')
+
+
+def _unpack(text, dtype):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).copy()
+
+
+class KLLSketch:
+    """Quantile sketch: level i keeps a sample of items that each stand for 2**i values"""
+
+    def __init__(self, k=200):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(0)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind so the total weight is preserved
+                keep, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.count += len(values)
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        self.k = max(self.k, other.k)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """Approximate values at each fraction (0..1) of the ranked data"""
+        if not self.count:
+            return [None for _ in fractions]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.min)
+            elif fraction >= 1:
+                results.append(self.max)
+            else:
+                index = int(np.searchsorted(cumulative, fraction * cumulative[-1]))
+                results.append(float(items[min(index, len(items) - 1)]))
+        return results
+
+    def to_dict(self):
+        return {
+            'k': self.k,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'levels': [_pack(items.astype('<f8')) for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.count = data['count']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [_unpack(items, '<f8') for items in data['levels']] or [np.empty(0)]
+        return sketch
+
+
+class HyperLogLog:
+    """Distinct-count estimator over 2**precision one-byte registers"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        if not len(values):
+            return
+        # pandas' hash is vectorized and stable across processes, so registers merge over time
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # Rank is the position of the first 1-bit in the remaining bits
+        rank = np.full(len(hashes), bits + 1, dtype=np.uint8)
+        nonzero = rest > 0
+        rank[nonzero] = bits - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': _pack(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = _unpack(data['registers'], np.uint8)
+        return sketch
+
+
+class DatasetSketch:
+    """Quantile sketches per parameter and per (parameter, type), plus distinct equipment names"""
+
+    def __init__(self, k=None, max_types=None):
+        self.k = k or settings.SKETCH_K
+        # Per-type sketches stop at this many types so the document stays small
+        self.max_types = max_types or settings.SKETCH_MAX_TYPES
+        self.parameters = {column: KLLSketch(self.k) for column in NUMERIC_COLUMNS}
+        self.by_type = {}
+        self.names = HyperLogLog()
+
+    def _type_sketches(self, equipment_type):
+        sketches = self.by_type.get(equipment_type)
+        if sketches is None and len(self.by_type) < self.max_types:
+            sketches = self.by_type[equipment_type] = {column: KLLSketch(self.k) for column in NUMERIC_COLUMNS}
+        return sketches
+
+    def update(self, chunk):
+        """Add a DataFrame with Equipment field names as columns"""
+        if chunk.empty:
+            return
+        columns = {column: chunk[column].to_numpy(dtype=np.float64) for column in NUMERIC_COLUMNS}
+        for column in NUMERIC_COLUMNS:
+            self.parameters[column].update(columns[column])
+        codes, types = pd.factorize(chunk['equipment_type'])
+        for code, equipment_type in enumerate(types):
+            sketches = self._type_sketches(equipment_type)
+            if sketches is None:
+                continue
+            mask = codes == code
+            for column in NUMERIC_COLUMNS:
+                sketches[column].update(columns[column][mask])
+        self.names.update(chunk['equipment_name'].to_numpy())
+
+    def merge(self, other):
+        for column in NUMERIC_COLUMNS:
+            self.parameters[column].merge(other.parameters[column])
+        for equipment_type, sketches in other.by_type.items():
+            mine = self._type_sketches(equipment_type)
+            if mine is not None:
+                for column in NUMERIC_COLUMNS:
+                    mine[column].merge(sketches[column])
+        self.names.merge(other.names)
+        return self
+
+    def to_dict(self):
+        return {
+            'k': self.k,
+            'max_types': self.max_types,
+            'parameters': {column: sketch.to_dict() for column, sketch in self.parameters.items()},
+            'by_type': {
+                equipment_type: {column: sketch.to_dict() for column, sketch in sketches.items()}
+                for equipment_type, sketches in self.by_type.items()
+            },
+            'names': self.names.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'], data['max_types'])
+        sketch.parameters = {column: KLLSketch.from_dict(value) for column, value in data['parameters'].items()}
+        sketch.by_type = {
+            equipment_type: {column: KLLSketch.from_dict(value) for column, value in sketches.items()}
+            for equipment_type, sketches in data['by_type'].items()
+        }
+        sketch.names = HyperLogLog.from_dict(data['names'])
+        return sketch
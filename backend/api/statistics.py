@@ -0,0 +1,243 @@
+import math
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Dataset
+from .bulk import EQUIPMENT_COLUMNS
+from .columnar import ColumnStore, NUMERIC_COLUMNS
+from .sketches import DatasetSketch
+
+
+STATISTICS_VERSION = 2
+PERCENTILES = [5, 25, 50, 75, 95]
+GROUP_AGGREGATES = ['count', 'mean', 'std', 'min', 'max', 'median']
+
+
+def _number(value):
+    """Plain float for JSON; NaN (e.g. std of a single row) becomes None"""
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def parameter_statistics(values, bins):
+    """Moments, percentiles and a fixed-bin histogram of one column, computed with vectorized NumPy"""
+    if len(values) == 0:
+        return {'count': 0, 'histogram': {'edges': [], 'counts': []}}
+    values = np.asarray(values, dtype=np.float64)
+    p5, p25, median, p75, p95 = np.percentile(values, PERCENTILES)
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        'count': int(len(values)),
+        'mean': _number(values.mean()),
+        'std': _number(values.std(ddof=1)) if len(values) > 1 else None,
+        'min': _number(values.min()),
+        'max': _number(values.max()),
+        'median': _number(median),
+        'p5': _number(p5),
+        'p25': _number(p25),
+        'p75': _number(p75),
+        'p95': _number(p95),
+        'histogram': {'edges': [_number(edge) for edge in edges], 'counts': counts.tolist()},
+    }
+
+
+def type_statistics(columns, type_codes, types):
+    """Per-equipment-type count, mean, std, min, max and median of every parameter, largest type first"""
+    if len(type_codes) == 0:
+        return []
+    frame = pd.DataFrame({column: np.asarray(columns[column]) for column in NUMERIC_COLUMNS})
+    frame['equipment_type'] = pd.Categorical.from_codes(np.asarray(type_codes), categories=types)
+    grouped = frame.groupby('equipment_type', observed=True)[NUMERIC_COLUMNS].agg(GROUP_AGGREGATES)
+
+    by_type = []
+    for equipment_type, row in grouped.iterrows():
+        entry = {'equipment_type': equipment_type, 'count': int(row[(NUMERIC_COLUMNS[0], 'count')])}
+        for column in NUMERIC_COLUMNS:
+            entry[column] = {
+                aggregate: _number(row[(column, aggregate)]) for aggregate in GROUP_AGGREGATES if aggregate != 'count'
+            }
+        by_type.append(entry)
+    return sorted(by_type, key=lambda entry: (-entry['count'], entry['equipment_type']))
+
+
+def compute_statistics(columns, type_codes, types, bins=None, sketch=None):
+    """Full statistics document for a dataset from its numeric columns and dictionary-encoded types"""
+    bins = bins or settings.STATISTICS_HISTOGRAM_BINS
+    return {
+        'version': STATISTICS_VERSION,
+        'approximate': False,
+        'percentiles': PERCENTILES,
+        'parameters': {column: parameter_statistics(columns[column], bins) for column in NUMERIC_COLUMNS},
+        'by_type': type_statistics(columns, type_codes, types),
+        'distinct_names': sketch.names.estimate() if sketch else None,
+    }
+
+
+class GroupMoments:
+    """Count, mean, M2, min and max per group, merged block by block (Chan et al.) without keeping rows"""
+
+    def __init__(self, groups):
+        self.count = np.zeros(groups, dtype=np.int64)
+        self.mean = np.zeros(groups)
+        self.m2 = np.zeros(groups)
+        self.min = np.full(groups, np.inf)
+        self.max = np.full(groups, -np.inf)
+
+    def update(self, values, codes):
+        groups = len(self.count)
+        counts = np.bincount(codes, minlength=groups)
+        present = counts > 0
+        means = np.divide(np.bincount(codes, weights=values, minlength=groups), counts,
+                          out=np.zeros(groups), where=present)
+        m2 = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=groups)
+        total = self.count + counts
+        delta = means - self.mean
+        share = np.divide(counts, total, out=np.zeros(groups), where=total > 0)
+        self.m2 += m2 + delta ** 2 * self.count * share
+        self.mean += delta * share
+        self.count = total
+        np.minimum.at(self.min, codes, values)
+        np.maximum.at(self.max, codes, values)
+
+    def summary(self, group):
+        count = int(self.count[group])
+        return {
+            'mean': _number(self.mean[group]) if count else None,
+            'std': _number(np.sqrt(self.m2[group] / (count - 1))) if count > 1 else None,
+            'min': _number(self.min[group]) if count else None,
+            'max': _number(self.max[group]) if count else None,
+        }
+
+
+def approximate_statistics(store, sketch, bins=None, block_size=None):
+    """Same document as compute_statistics, reading the store in blocks and taking quantiles from sketch"""
+    bins = bins or settings.STATISTICS_HISTOGRAM_BINS
+    block_size = block_size or settings.INGEST_CHUNK_SIZE
+    overall = {column: GroupMoments(1) for column in NUMERIC_COLUMNS}
+    by_type = {column: GroupMoments(len(store.types)) for column in NUMERIC_COLUMNS}
+    blocks = [(start, min(start + block_size, store.rows)) for start in range(0, store.rows, block_size)]
+
+    for start, stop in blocks:
+        codes = np.asarray(store.type_codes[start:stop], dtype=np.int64)
+        zeros = np.zeros(len(codes), dtype=np.int64)
+        for column in NUMERIC_COLUMNS:
+            values = np.asarray(store.column(column)[start:stop])
+            overall[column].update(values, zeros)
+            by_type[column].update(values, codes)
+
+    # Histogram edges need the global range, so counts take a second pass
+    edges = {}
+    counts = {}
+    for column in NUMERIC_COLUMNS:
+        if store.rows:
+            edges[column] = np.histogram_bin_edges([], bins=bins, range=(overall[column].min[0], overall[column].max[0]))
+            counts[column] = np.zeros(bins, dtype=np.int64)
+    for start, stop in blocks:
+        for column in NUMERIC_COLUMNS:
+            counts[column] += np.histogram(np.asarray(store.column(column)[start:stop]), bins=edges[column])[0]
+
+    parameters = {}
+    for column in NUMERIC_COLUMNS:
+        if not store.rows:
+            parameters[column] = {'count': 0, 'histogram': {'edges': [], 'counts': []}}
+            continue
+        p5, p25, median, p75, p95 = sketch.parameters[column].quantiles([p / 100 for p in PERCENTILES])
+        parameters[column] = {
+            'count': store.rows,
+            **overall[column].summary(0),
+            'median': median, 'p5': p5, 'p25': p25, 'p75': p75, 'p95': p95,
+            'histogram': {'edges': [_number(edge) for edge in edges[column]], 'counts': counts[column].tolist()},
+        }
+
+    types = []
+    for code, equipment_type in enumerate(store.types):
+        count = int(by_type[NUMERIC_COLUMNS[0]].count[code])
+        if not count:
+            continue
+        sketches = sketch.by_type.get(equipment_type)
+        entry = {'equipment_type': equipment_type, 'count': count}
+        for column in NUMERIC_COLUMNS:
+            median = sketches[column].quantiles([0.5])[0] if sketches else None
+            entry[column] = {**by_type[column].summary(code), 'median': median}
+        types.append(entry)
+
+    return {
+        'version': STATISTICS_VERSION,
+        'approximate': True,
+        'percentiles': PERCENTILES,
+        'parameters': parameters,
+        'by_type': sorted(types, key=lambda entry: (-entry['count'], entry['equipment_type'])),
+        'distinct_names': sketch.names.estimate(),
+    }
+
+
+def store_sketch(store, block_size=None):
+    """Build a DatasetSketch from an existing column store, block by block"""
+    block_size = block_size or settings.INGEST_CHUNK_SIZE
+    sketch = DatasetSketch()
+    for start in range(0, store.rows, block_size):
+        sketch.update(pd.DataFrame.from_records(
+            store.records(start, start + block_size), columns=EQUIPMENT_COLUMNS
+        ))
+    return sketch
+
+
+def store_statistics(store, sketch=None):
+    """Statistics from a column store's memory-mapped arrays; big stores use sketches and flat memory"""
+    if store.rows > settings.EXACT_STATISTICS_MAX_ROWS:
+        return approximate_statistics(store, sketch or store_sketch(store))
+    columns = {column: store.column(column) for column in NUMERIC_COLUMNS}
+    return compute_statistics(columns, store.type_codes, store.types, sketch=sketch)
+
+
+def equipment_frame(dataset):
+    """A dataset's Equipment rows as a DataFrame, in upload order"""
+    return pd.DataFrame.from_records(
+        dataset.equipment.order_by('id').values_list(*EQUIPMENT_COLUMNS), columns=EQUIPMENT_COLUMNS
+    )
+
+
+def dataset_sketch(dataset):
+    """Build a dataset's sketches from its column store, or its Equipment rows when it has none"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return store_sketch(store)
+    sketch = DatasetSketch()
+    sketch.update(equipment_frame(dataset))
+    return sketch
+
+
+def dataset_statistics(dataset, sketch):
+    """Compute statistics for a dataset from its column store, or its Equipment rows when it has none"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return store_statistics(store, sketch)
+    frame = equipment_frame(dataset)
+    codes, types = pd.factorize(frame['equipment_type'])
+    columns = {column: frame[column].to_numpy(dtype=np.float64) for column in NUMERIC_COLUMNS}
+    return compute_statistics(columns, codes, [str(t) for t in types], sketch=sketch)
+
+
+def get_statistics(dataset):
+    """The stored statistics, computing and saving them (and missing sketches) once for older or appended datasets"""
+    if dataset.statistics.get('version') == STATISTICS_VERSION:
+        return dataset.statistics
+    with transaction.atomic():
+        # Locked, so an append cannot change the rows while they are summarized
+        locked = Dataset.objects.lock(dataset.pk)
+        if locked.statistics.get('version') != STATISTICS_VERSION:
+            fields = ['statistics', 'updated_at']
+            if locked.sketches:
+                sketch = DatasetSketch.from_dict(locked.sketches)
+            else:
+                sketch = dataset_sketch(locked)
+                locked.sketches = sketch.to_dict()
+                fields.append('sketches')
+            locked.statistics = dataset_statistics(locked, sketch)
+            # Moves the dataset's version, so cached responses without these statistics are revalidated
+            locked.updated_at = timezone.now()
+            locked.save(update_fields=fields)
+    dataset.statistics, dataset.sketches, dataset.updated_at = locked.statistics, locked.sketches, locked.updated_at
+    return dataset.statistics
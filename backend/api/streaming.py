@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .bulk import EQUIPMENT_COLUMNS
+from .ingest import REQUIRED_COLUMNS
+
+
+# Streamed rows carry the same fields as a page of EquipmentSerializer output
+ROW_COLUMNS = ['id'] + EQUIPMENT_COLUMNS
+# CSV exports put the row id before the upload format's columns; uploads ignore it
+CSV_HEADER = ['ID'] + REQUIRED_COLUMNS
+
+
+def queryset_rows(queryset, columns=ROW_COLUMNS):
+    """Equipment tuples in columns order, fetched through a server-side cursor"""
+    return queryset.values_list(*columns).iterator(chunk_size=settings.EQUIPMENT_STREAM_CHUNK_SIZE)
+
+
+def store_rows(store, columns=ROW_COLUMNS):
+    """Equipment tuples in columns order, read block by block from a column store"""
+    block = settings.EQUIPMENT_STREAM_CHUNK_SIZE
+    for start in range(0, store.rows, block):
+        for record in store.records(start, start + block):
+            yield tuple(record[col] for col in columns)
+
+
+def _batched(lines):
+    """Join encoded lines into larger writes so each row isn't its own socket write"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= settings.EQUIPMENT_STREAM_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(ROW_COLUMNS, row))) + '\n'
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The upload format's header plus ID, so an export can be uploaded again
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def stream_equipment(rows, fmt, filename):
+    """StreamingHttpResponse writing rows as NDJSON or CSV while they are read"""
+    if fmt == 'csv':
+        response = StreamingHttpResponse(_batched(_csv_lines(rows)), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    else:
+        response = StreamingHttpResponse(
+            _batched(_ndjson_lines(rows)), content_type='application/x-ndjson; charset=utf-8'
+        )
+    return response
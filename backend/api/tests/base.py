@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+from benchmarks.common import make_frame, write_csv
+
+
+class APITestMixin:
+    """A signed-in client, a scratch directory for media/ and helpers to upload generated CSVs.
+
+    Jobs are not handed to worker threads (JOB_WORKERS=0); tests run them
+    with api.jobs.run_pending().
+    """
+    username = 'tester'
+
+    def setUp(self):
+        super().setUp()
+        work_dir = tempfile.mkdtemp(prefix='api_tests_')
+        cwd = os.getcwd()
+        # Uploads, column stores and reports are written under media/ relative to the working directory
+        os.chdir(work_dir)
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        self.addCleanup(os.chdir, cwd)
+        settings_override = override_settings(JOB_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username=self.username)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def write_csv(self, rows, seed=0, name='equipment.csv'):
+        """Path of a generated upload CSV; different seeds give different bytes"""
+        write_csv(name, make_frame(rows, seed))
+        return name
+
+    def upload(self, rows=100, seed=0, query=''):
+        with open(self.write_csv(rows, seed), 'rb') as f:
+            response = self.client.post(f'/api/datasets/upload/{query}', {'file': f}, format='multipart')
+        self.assertIn(response.status_code, (201, 202), getattr(response, 'data', None))
+        return response
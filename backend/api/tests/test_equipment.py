@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from django.db import connection
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from .base import APITestMixin
+
+
+class EquipmentListingTests(APITestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload(rows=500).data['id']
+
+    def equipment_query_plan(self, query):
+        """SQLite's plan for the Equipment query behind one page of the listing"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/datasets/{self.dataset_id}/equipment/?{query}')
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        sql = next(q['sql'] for q in context.captured_queries if 'FROM "api_equipment"' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filters_and_sorts_read_an_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Checks SQLite query plans')
+        cases = {
+            '': 'equipment_dataset_id_idx',
+            'type=Pump': 'equipment_dataset_type_idx',
+            'flowrate_min=140&flowrate_max=160&ordering=flowrate': 'equipment_dataset_flow_idx',
+            'ordering=-pressure': 'equipment_dataset_press_idx',
+            'ordering=temperature': 'equipment_dataset_temp_idx',
+            'search=EQ-12&ordering=equipment_name': 'equipment_dataset_name_idx',
+        }
+        for query, index in cases.items():
+            with self.subTest(query=query):
+                plan = self.equipment_query_plan(query)
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class EquipmentStreamTests(APITestMixin, TestCase):
+
+    def assert_streams_match_pages(self):
+        dataset_id = self.upload(rows=120).data['id']
+        url = f'/api/datasets/{dataset_id}/equipment/'
+        paged = self.client.get(url, {'page_size': 200}).data['results']
+
+        ndjson = b''.join(self.client.get(url, {'format': 'ndjson'}).streaming_content).decode()
+        self.assertEqual([json.loads(line) for line in ndjson.splitlines()], [dict(row) for row in paged])
+
+        exported = b''.join(self.client.get(url, {'format': 'csv'}).streaming_content).decode()
+        header, *rows = csv.reader(io.StringIO(exported))
+        self.assertEqual(header[0], 'ID')
+        self.assertEqual([int(row[0]) for row in rows], [row['id'] for row in paged])
+
+    def test_table_streams_carry_ids(self):
+        self.assert_streams_match_pages()
+
+    @override_settings(STORE_EQUIPMENT_ROWS=False)
+    def test_column_store_streams_carry_ids(self):
+        self.assert_streams_match_pages()
@@ -0,0 +1,99 @@
+from unittest import mock
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from api import ingest
+from api.models import Dataset, Job
+from benchmarks.common import make_frame, write_csv
+from .base import APITestMixin
+
+
+@override_settings(INGEST_CHUNK_SIZE=100)
+class SynchronousIngestTests(APITestMixin, TransactionTestCase):
+
+    def test_chunks_commit_before_the_dataset_is_ready(self):
+        between_chunks = []
+        read_csv_chunks = ingest.read_csv_chunks
+
+        def observe(*args, **kwargs):
+            for chunk in read_csv_chunks(*args, **kwargs):
+                yield chunk
+                # Runs once the chunk's own transaction has committed
+                between_chunks.append((
+                    transaction.get_connection().in_atomic_block,
+                    Dataset.objects.filter(user=self.user).exists(),
+                    Dataset.objects.ready().filter(user=self.user).exists(),
+                ))
+
+        with mock.patch.object(ingest, 'read_csv_chunks', observe):
+            response = self.upload(rows=450)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(between_chunks, [(False, True, False)] * 5)
+        dataset = Dataset.objects.ready().get(pk=response.data['id'])
+        self.assertEqual(dataset.total_count, 450)
+        job = Job.objects.get(kind=Job.KIND_INGEST, dataset=dataset)
+        self.assertEqual((job.state, job.rows_processed), (Job.STATE_DONE, 450))
+
+    def test_failed_ingest_removes_the_committed_chunks(self):
+        frame = make_frame(450, 0)
+        # Too many rejected rows fails the upload only after every chunk has been written
+        frame['flowrate'] = frame['flowrate'].astype(object)
+        frame.loc[100:, 'flowrate'] = 'n/a'
+        write_csv('equipment.csv', frame)
+        with open('equipment.csv', 'rb') as f:
+            response = self.client.post('/api/datasets/upload/', {'file': f}, format='multipart')
+
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertFalse(Dataset.objects.exists())
+        self.assertEqual(Job.objects.get(kind=Job.KIND_INGEST).state, Job.STATE_FAILED)
+
+
+class RejectionReportTests(APITestMixin, TransactionTestCase):
+
+    def test_report_uses_crlf_throughout(self):
+        frame = make_frame(100, 0)
+        frame['pressure'] = frame['pressure'].astype(object)
+        frame.loc[[3, 40, 77], 'pressure'] = 'n/a'
+        write_csv('equipment.csv', frame)
+        with open('equipment.csv', 'rb') as f:
+            response = self.client.post('/api/datasets/upload/', {'file': f}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        report = b''.join(self.client.get(f'/api/datasets/{response.data["id"]}/rejections/').streaming_content)
+        lines = report.split(b'\r\n')
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[-1], b'')
+        self.assertFalse(any(b'\n' in line or b'\r' in line for line in lines))
+
+
+@override_settings(CSV_ENGINE='c', INGEST_CHUNK_SIZE=100)
+class ExtraFieldTests(APITestMixin, TransactionTestCase):
+
+    def post_csv(self, text):
+        with open('equipment.csv', 'w', newline='') as f:
+            f.write(text)
+        with open('equipment.csv', 'rb') as f:
+            return self.client.post('/api/datasets/upload/', {'file': f}, format='multipart')
+
+    def rows(self, count, wide_row=None):
+        return ''.join(
+            f'EQ-{i},Pump,1.5,2.5,3.5{",extra" if i + 1 == wide_row else ""}\r\n' for i in range(count)
+        )
+
+    def test_row_with_an_extra_field_is_refused(self):
+        header = 'Equipment Name,Type,Flowrate,Pressure,Temperature\r\n'
+        # The first row, the first row of the second chunk and one inside a chunk
+        for wide_row in (1, 101, 150):
+            with self.subTest(row=wide_row):
+                response = self.post_csv(header + self.rows(250, wide_row))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(f'Expected 5 fields in row {wide_row}, saw 6', str(response.data))
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_extra_columns_and_blank_lines_are_accepted(self):
+        header = 'ID,Equipment Name,Type,Flowrate,Pressure,Temperature\r\n'
+        rows = [f'{i + 1},EQ-{i},Pump,1.5,2.5,3.5\r\n' for i in range(250)]
+        rows[120:120] = ['\r\n', '\r\n']
+        response = self.post_csv(header + ''.join(rows))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['total_count'], 250)
@@ -0,0 +1,17 @@
+from django.test import TestCase
+from api.querybudget import ENDPOINT_BUDGETS, check_budget_growth, check_endpoint_budgets, make_budget_dataset
+from .base import APITestMixin
+
+
+class QueryBudgetTests(APITestMixin, TestCase):
+
+    def test_endpoints_stay_within_budget(self):
+        dataset = make_budget_dataset(self.user, 0, rows=200)
+        # Raises QueryBudgetExceeded, an AssertionError, with the captured SQL on an overrun
+        results = check_endpoint_budgets(self.client, dataset.id)
+        self.assertEqual([label for label, _, _ in results], [label for label, _, _ in ENDPOINT_BUDGETS])
+
+    def test_query_counts_do_not_grow_with_datasets(self):
+        for label, before, after, _ in check_budget_growth(self.client, self.user, dataset_count=10, rows=50):
+            with self.subTest(endpoint=label):
+                self.assertEqual(after, before, f'{before} queries with 1 dataset, {after} with 10')
@@ -0,0 +1,37 @@
+import re
+import tracemalloc
+from django.test import TestCase
+from api.models import Dataset
+from api.utils import FULL_REPORT_ROWS_PER_PAGE, render_full_pdf_report
+from .base import APITestMixin
+
+
+class FullReportTests(APITestMixin, TestCase):
+
+    def render(self, rows, seed=0, **changes):
+        """(page count, peak traced bytes) of a full report for a freshly uploaded dataset"""
+        dataset_id = self.upload(rows=rows, seed=seed).data['id']
+        Dataset.objects.filter(pk=dataset_id).update(**changes)
+        dataset = Dataset.objects.get(pk=dataset_id)
+        path = f'report_{dataset_id}.pdf'
+        tracemalloc.start()
+        try:
+            render_full_pdf_report(dataset, path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        with open(path, 'rb') as f:
+            pdf = f.read()
+        self.assertTrue(pdf.startswith(b'%PDF-') and pdf.rstrip().endswith(b'%%EOF'))
+        return len(re.findall(rb'/Type\s*/Page\b(?!s)', pdf)), peak
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        small_pages, small_peak = self.render(2_000, seed=1)
+        large_pages, large_peak = self.render(8_000, seed=2)
+        self.assertGreaterEqual(large_pages - small_pages, 6_000 // FULL_REPORT_ROWS_PER_PAGE)
+        # Four times the rows; ReportLab's in-memory document would need several MiB more
+        self.assertLess(large_peak, small_peak + 512 * 1024)
+
+    def test_renders_from_equipment_rows(self):
+        pages, _ = self.render(500, columns_path='')
+        self.assertGreaterEqual(pages, 2 + 500 // FULL_REPORT_ROWS_PER_PAGE)
@@ -0,0 +1,29 @@
+from django.test import TransactionTestCase, override_settings
+from api.jobs import claim, run_pending
+from api.models import Dataset, Job
+from .base import APITestMixin
+
+
+@override_settings(RETENTION_MAX_DATASETS=5, RETENTION_MAX_AGE_DAYS=0, RETENTION_MAX_BYTES_PER_USER=0)
+class ScheduleRetentionTests(APITestMixin, TransactionTestCase):
+
+    def retention_jobs(self, state):
+        return Job.objects.filter(user=self.user, kind=Job.KIND_RETENTION, state=state)
+
+    def test_uploads_share_one_queued_job(self):
+        for seed in range(3):
+            self.upload(seed=seed)
+        self.assertEqual(self.retention_jobs(Job.STATE_QUEUED).count(), 1)
+
+    def test_upload_during_a_running_job_schedules_another(self):
+        for seed in range(5):
+            self.upload(seed=seed)
+        # The worker has listed the five datasets and is deleting; two more uploads land meanwhile
+        running = self.retention_jobs(Job.STATE_QUEUED).get()
+        self.assertTrue(claim(running.pk))
+        for seed in range(5, 7):
+            self.upload(seed=seed)
+
+        self.assertEqual(self.retention_jobs(Job.STATE_QUEUED).count(), 1)
+        run_pending()
+        self.assertEqual(Dataset.objects.filter(user=self.user).count(), 5)
@@ -0,0 +1,25 @@
+import numpy as np
+from django.test import TestCase, override_settings
+from benchmarks.common import make_frame
+from .base import APITestMixin
+
+
+@override_settings(SKETCH_MAX_TYPES=2)
+class StatisticsTests(APITestMixin, TestCase):
+
+    def test_multi_chunk_upload_gets_exact_statistics(self):
+        # More rows than one ingest chunk and more types than get sketches of their own
+        rows, seed = 60_000, 3
+        frame = make_frame(rows, seed)
+        dataset_id = self.upload(rows=rows, seed=seed).data['id']
+
+        statistics = self.client.get(f'/api/datasets/{dataset_id}/statistics/').data
+        self.assertFalse(statistics['approximate'])
+        for param in ('flowrate', 'pressure', 'temperature'):
+            expected = np.percentile(frame[param], [5, 50, 95])
+            actual = [statistics['parameters'][param][key] for key in ('p5', 'median', 'p95')]
+            np.testing.assert_allclose(actual, expected)
+        medians = {entry['equipment_type']: entry['flowrate']['median'] for entry in statistics['by_type']}
+        self.assertEqual(set(medians), set(frame['equipment_type']))
+        for equipment_type, median in medians.items():
+            self.assertAlmostEqual(median, frame.loc[frame['equipment_type'] == equipment_type, 'flowrate'].median())
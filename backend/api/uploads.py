@@ -0,0 +1,99 @@
+import os
+import re
+from django.http import UnreadablePostError
+from .models import UploadSession
+from .ingest import UPLOAD_DIR, hash_file, store_by_hash
+
+
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, 'partial')
+READ_BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class RangeError(ValueError):
+    """Raised when a chunk does not line up with what the session has received"""
+
+
+class SizeMismatchError(ValueError):
+    """Raised when a chunk's Content-Range total is not the size the session was created with"""
+
+
+def parse_content_range(header):
+    """Return (start, length, total) from a 'bytes start-end/total' Content-Range header; total is None for '*'"""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise RangeError('Content-Range header must look like "bytes <start>-<end>/<total>"')
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        raise RangeError('Content-Range end is before its start')
+    total = None if match.group(3) == '*' else int(match.group(3))
+    return start, end - start + 1, total
+
+
+def start_session(user, filename, size):
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    session = UploadSession(user=user, filename=filename, size=size)
+    session.file_path = os.path.join(PARTIAL_DIR, f'{session.id}.part')
+    open(session.file_path, 'wb').close()
+    session.save()
+    return session
+
+
+def write_range(session, start, length, stream, total=None):
+    """Append length bytes from stream at start and return the session's new offset.
+
+    The body is copied to disk in small blocks, never held in memory whole.
+    If the client drops mid-chunk, the bytes that did arrive are kept so the
+    next attempt resumes from there. A failed disk write (a full disk, say)
+    drops the chunk and raises OSError, leaving the offset where it was.
+    """
+    if total is not None and total != session.size:
+        raise SizeMismatchError(f'Content-Range total {total} does not match the upload size {session.size}')
+    if start != session.offset:
+        raise RangeError(f'Expected chunk at offset {session.offset}, got {start}')
+    if start + length > session.size:
+        raise RangeError('Chunk runs past the declared upload size')
+
+    written = 0
+    try:
+        with open(session.file_path, 'r+b') as destination:
+            # Drop any tail left by a write that never got recorded
+            destination.seek(start)
+            destination.truncate()
+            while written < length:
+                try:
+                    block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                except (UnreadablePostError, OSError):
+                    # The client went away; keep what arrived
+                    break
+                if not block:
+                    break
+                destination.write(block)
+                written += len(block)
+    except OSError:
+        os.truncate(session.file_path, start)
+        raise
+
+    updated = UploadSession.objects.filter(pk=session.pk, offset=start).update(offset=start + written)
+    if not updated:
+        raise RangeError('Another request wrote to this upload concurrently')
+    session.offset = start + written
+    return session.offset
+
+
+def complete_session(session):
+    """Store a fully received upload by content hash, close the session and return (path, content_hash)"""
+    if not session.is_complete:
+        raise RangeError(f'Upload incomplete: {session.offset} of {session.size} bytes received')
+    # Chunks arrive over separate requests, so the digest is taken once here
+    content_hash = hash_file(session.file_path)
+    file_path = store_by_hash(session.file_path, content_hash)
+    session.delete()
+    return file_path, content_hash
+
+
+def discard_session(session):
+    if os.path.exists(session.file_path):
+        os.remove(session.file_path)
+    session.delete()
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import register, DatasetViewSet
+from .views import register, DatasetViewSet, UploadSessionViewSet
 
 router = DefaultRouter()
 router.register(r'datasets', DatasetViewSet, basename='dataset')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('auth/register/', register, name='register'),
@@ -2,27 +2,61 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from datetime import datetime
-import os
+from itertools import islice
+from django.db.models.functions import Abs
+from .anomalies import get_anomaly_count, flagged_cells, iter_flagged_cells
+from .columnar import ColumnStore, NUMERIC_COLUMNS, get_type_distribution, equipment_records
+from .pdfwriter import StreamingCanvas
+from .reports import get_cached_report, find_cached_report
+from .statistics import get_statistics
+from .streaming import queryset_rows, store_rows
+from .bulk import EQUIPMENT_COLUMNS
+
+
+# Bump whenever the report layout changes so cached PDFs are rendered again
+REPORT_TEMPLATE_VERSION = 3
+
+SUMMARY_REPORT = 'summary'
+FULL_REPORT = 'full'
+
+# Full reports draw the equipment table at most this many rows per page
+FULL_REPORT_ROWS_PER_PAGE = 46
+# Pages between progress callbacks while rendering a full report
+FULL_REPORT_PROGRESS_PAGES = 20
+
+EQUIPMENT_COLUMN_WIDTHS = [2*inch, 1.5*inch, 1*inch, 1*inch, 1*inch]
+# Table column of each parameter, for highlighting flagged values
+PARAMETER_COLUMNS = {param: 2 + i for i, param in enumerate(NUMERIC_COLUMNS)}
+FLAGGED_COLOR = colors.HexColor('#fca5a5')
+# Most extreme flagged values listed in the report
+FLAGGED_REPORT_ROWS = 20
 
 
 def generate_pdf_report(dataset):
-    """Generate a PDF report for a dataset"""
-    
-    # Create reports directory
-    reports_dir = 'media/reports'
-    os.makedirs(reports_dir, exist_ok=True)
-    
-    # Generate filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    pdf_filename = f"{reports_dir}/report_{dataset.id}_{timestamp}.pdf"
-    
-    # Create PDF
-    doc = SimpleDocTemplate(pdf_filename, pagesize=letter)
+    """Path of the dataset's PDF report, rendered only if it is not cached yet"""
+    return get_cached_report(
+        dataset, SUMMARY_REPORT, REPORT_TEMPLATE_VERSION, lambda path: render_pdf_report(dataset, path)
+    )
+
+
+def find_full_pdf_report(dataset):
+    """Path of the dataset's cached full report, or None if it still has to be rendered"""
+    return find_cached_report(dataset, FULL_REPORT, REPORT_TEMPLATE_VERSION)
+
+
+def generate_full_pdf_report(dataset, progress=None):
+    """Path of the dataset's report with every equipment row; slow for big datasets, so run it as a job"""
+    return get_cached_report(
+        dataset, FULL_REPORT, REPORT_TEMPLATE_VERSION,
+        lambda path: render_full_pdf_report(dataset, path, progress)
+    )
+
+
+def summary_story(dataset, styles):
+    """Title, dataset info, statistics, type distribution and flagged value flowables shared by every report"""
     story = []
-    styles = getSampleStyleSheet()
     
     # Title
     title_style = ParagraphStyle(
@@ -47,12 +81,13 @@ def generate_pdf_report(dataset):
     story.append(Paragraph("<b>Summary Statistics</b>", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
-    stats_data = [
-        ['Parameter', 'Average', 'Minimum', 'Maximum'],
-        ['Flowrate', f'{dataset.avg_flowrate:.2f}', f'{dataset.min_flowrate:.2f}', f'{dataset.max_flowrate:.2f}'],
-        ['Pressure', f'{dataset.avg_pressure:.2f}', f'{dataset.min_pressure:.2f}', f'{dataset.max_pressure:.2f}'],
-        ['Temperature', f'{dataset.avg_temperature:.2f}', f'{dataset.min_temperature:.2f}', f'{dataset.max_temperature:.2f}'],
-    ]
+    # Aggregates are None for a dataset without rows
+    stats_data = [['Parameter', 'Average', 'Minimum', 'Maximum']]
+    for param in ('flowrate', 'pressure', 'temperature'):
+        stats_data.append([param.capitalize()] + [
+            '-' if value is None else f'{value:.2f}'
+            for value in (getattr(dataset, f'{aggregate}_{param}') for aggregate in ('avg', 'min', 'max'))
+        ])
     
     stats_table = Table(stats_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
     stats_table.setStyle(TableStyle([
@@ -68,18 +103,38 @@ def generate_pdf_report(dataset):
     story.append(stats_table)
     story.append(Spacer(1, 0.3*inch))
     
+    # Spread (stored at ingestion, no row scan)
+    statistics = get_statistics(dataset)['parameters']
+    spread_data = [['Parameter', 'Std Dev', 'P5', 'Median', 'P95']]
+    for param in ('flowrate', 'pressure', 'temperature'):
+        values = statistics[param]
+        spread_data.append([param.capitalize()] + [
+            '-' if values.get(key) is None else f'{values[key]:.2f}'
+            for key in ('std', 'p5', 'median', 'p95')
+        ])
+    
+    spread_table = Table(spread_data, colWidths=[2*inch, 1.125*inch, 1.125*inch, 1.125*inch, 1.125*inch])
+    spread_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    story.append(spread_table)
+    story.append(Spacer(1, 0.3*inch))
+    
     # Equipment Type Distribution
     story.append(Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
-    type_counts = {}
-    for equipment in dataset.equipment.all():
-        type_counts[equipment.equipment_type] = type_counts.get(equipment.equipment_type, 0) + 1
-    
     type_data = [['Equipment Type', 'Count', 'Percentage']]
-    for eq_type, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
-        percentage = (count / dataset.total_count) * 100
-        type_data.append([eq_type, str(count), f'{percentage:.1f}%'])
+    for entry in get_type_distribution(dataset):
+        percentage = (entry['count'] / dataset.total_count) * 100
+        type_data.append([entry['equipment_type'], str(entry['count']), f'{percentage:.1f}%'])
     
     type_table = Table(type_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
     type_table.setStyle(TableStyle([
@@ -95,18 +150,83 @@ def generate_pdf_report(dataset):
     story.append(type_table)
     story.append(Spacer(1, 0.3*inch))
     
+    # Flagged values (stored at ingestion; only the most extreme are listed)
+    story.append(Paragraph("<b>Flagged Values</b>", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+    
+    anomaly_count = get_anomaly_count(dataset)
+    if not anomaly_count:
+        story.append(Paragraph("No values are outliers within their equipment type.", info_style))
+        story.append(Spacer(1, 0.3*inch))
+        return story
+    
+    story.append(Paragraph(
+        f"{anomaly_count} values are outliers within their equipment type (z-score or IQR rule); "
+        f"the {min(anomaly_count, FLAGGED_REPORT_ROWS)} most extreme are listed and flagged values "
+        f"are highlighted in the equipment tables.",
+        info_style
+    ))
+    story.append(Spacer(1, 0.1*inch))
+    
+    flagged_data = [['Row', 'Name', 'Type', 'Parameter', 'Value', 'Z-score', 'Rule']]
+    extreme = dataset.anomalies.order_by(Abs('zscore').desc(nulls_last=True), 'id')[:FLAGGED_REPORT_ROWS]
+    for anomaly in extreme:
+        rules = [rule for rule, flagged in (('z', anomaly.by_zscore), ('IQR', anomaly.by_iqr)) if flagged]
+        flagged_data.append([
+            str(anomaly.row),
+            anomaly.equipment_name[:20],
+            anomaly.equipment_type[:15],
+            anomaly.parameter.capitalize(),
+            f'{anomaly.value:.2f}',
+            '-' if anomaly.zscore is None else f'{anomaly.zscore:+.2f}',
+            ', '.join(rules),
+        ])
+    
+    flagged_table = Table(
+        flagged_data, colWidths=[0.6*inch, 1.6*inch, 1.2*inch, 1*inch, 0.9*inch, 0.8*inch, 0.7*inch]
+    )
+    flagged_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('BACKGROUND', (4, 1), (4, -1), FLAGGED_COLOR),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    story.append(flagged_table)
+    story.append(Spacer(1, 0.3*inch))
+    
+    return story
+
+
+def render_pdf_report(dataset, pdf_filename):
+    """Generate a PDF report for a dataset"""
+    
+    # Create PDF
+    doc = SimpleDocTemplate(pdf_filename, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = summary_story(dataset, styles)
+    
     # Equipment Details (first 50 items)
     story.append(Paragraph("<b>Equipment Details (First 50 Items)</b>", styles['Heading2']))
     story.append(Spacer(1, 0.1*inch))
     
     equipment_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temp']]
-    for equipment in dataset.equipment.all()[:50]:
+    highlights = []
+    flagged = flagged_cells(dataset, last_row=50)
+    for row, equipment in enumerate(equipment_records(dataset, limit=50), start=1):
+        for param in flagged.get(row, ()):
+            cell = (PARAMETER_COLUMNS[param], row)
+            highlights.append(('BACKGROUND', cell, cell, FLAGGED_COLOR))
         equipment_data.append([
-            equipment.equipment_name[:20],
-            equipment.equipment_type[:15],
-            f'{equipment.flowrate:.1f}',
-            f'{equipment.pressure:.1f}',
-            f'{equipment.temperature:.1f}'
+            equipment['equipment_name'][:20],
+            equipment['equipment_type'][:15],
+            f"{equipment['flowrate']:.1f}",
+            f"{equipment['pressure']:.1f}",
+            f"{equipment['temperature']:.1f}"
         ])
     
     equipment_table = Table(equipment_data, colWidths=[2*inch, 1.5*inch, 1*inch, 1*inch, 1*inch])
@@ -119,9 +239,179 @@ def generate_pdf_report(dataset):
         ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
         ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+    ] + highlights))
     story.append(equipment_table)
     
     # Build PDF
     doc.build(story)
     return pdf_filename
+
+
+class RowFlags:
+    """Flagged parameters of rows drawn in order, pulled from iter_flagged_cells a page at a time"""
+    
+    def __init__(self, cells):
+        self.cells = cells
+        self.pending = next(cells, None)
+    
+    def through(self, last_row):
+        """{row: {parameter, ...}} for the flagged rows up to last_row not returned before"""
+        found = {}
+        while self.pending is not None and self.pending[0] <= last_row:
+            row, parameters = self.pending
+            found[row] = parameters
+            self.pending = next(self.cells, None)
+        return found
+
+
+class EquipmentTablePage(Flowable):
+    """One page of the full equipment table.
+
+    Rows are pulled from an iterator shared by every page only when the page
+    is drawn, so pages hold no row data until then. flags, a RowFlags, gives
+    the parameters to highlight by 1-based row number.
+    """
+    HEADER_HEIGHT = 16
+    ROW_HEIGHT = 12
+    HEADERS = ['Name', 'Type', 'Flowrate', 'Pressure', 'Temp']
+    
+    def __init__(self, rows, start, count, flags, on_drawn=None):
+        super().__init__()
+        self.rows = rows
+        self.start = start
+        self.count = count
+        self.flags = flags
+        self.on_drawn = on_drawn
+        self.width = sum(EQUIPMENT_COLUMN_WIDTHS)
+        self.height = self.HEADER_HEIGHT + count * self.ROW_HEIGHT
+    
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+    
+    def draw(self):
+        canvas = self.canv
+        rows = list(islice(self.rows, self.count))
+        flagged = self.flags.through(self.start + len(rows))
+        body_height = len(rows) * self.ROW_HEIGHT
+        top = self.height
+        
+        canvas.setFillColor(colors.HexColor('#3b82f6'))
+        canvas.rect(0, top - self.HEADER_HEIGHT, self.width, self.HEADER_HEIGHT, stroke=0, fill=1)
+        canvas.setFillColor(colors.beige)
+        canvas.rect(0, top - self.HEADER_HEIGHT - body_height, self.width, body_height, stroke=0, fill=1)
+        
+        centers = []
+        x = 0
+        for width in EQUIPMENT_COLUMN_WIDTHS:
+            centers.append(x + width / 2)
+            x += width
+        
+        canvas.setFillColor(colors.whitesmoke)
+        canvas.setFont('Helvetica-Bold', 9)
+        for center, header in zip(centers, self.HEADERS):
+            canvas.drawCentredString(center, top - self.HEADER_HEIGHT + 5, header)
+        
+        lefts = [center - width / 2 for center, width in zip(centers, EQUIPMENT_COLUMN_WIDTHS)]
+        canvas.setFont('Helvetica', 8)
+        y = top - self.HEADER_HEIGHT
+        for row, (name, equipment_type, flowrate, pressure, temperature) in enumerate(rows, start=self.start + 1):
+            y -= self.ROW_HEIGHT
+            canvas.setFillColor(FLAGGED_COLOR)
+            for param in flagged.get(row, ()):
+                column = PARAMETER_COLUMNS[param]
+                canvas.rect(lefts[column], y, EQUIPMENT_COLUMN_WIDTHS[column], self.ROW_HEIGHT, stroke=0, fill=1)
+            canvas.setFillColor(colors.black)
+            cells = [name[:20], equipment_type[:15], f'{flowrate:.1f}', f'{pressure:.1f}', f'{temperature:.1f}']
+            for center, cell in zip(centers, cells):
+                canvas.drawCentredString(center, y + 3.5, cell)
+        
+        # Grid
+        canvas.setLineWidth(0.5)
+        bottom = top - self.HEADER_HEIGHT - body_height
+        x = 0
+        for width in [0] + EQUIPMENT_COLUMN_WIDTHS:
+            x += width
+            canvas.line(x, bottom, x, top)
+        for i in range(len(rows) + 2):
+            line_y = top if i == 0 else top - self.HEADER_HEIGHT - (i - 1) * self.ROW_HEIGHT
+            canvas.line(0, line_y, self.width, line_y)
+        
+        if self.on_drawn:
+            self.on_drawn(len(rows))
+
+
+class EquipmentTable(Flowable):
+    """Rows start..start+count of the full equipment table, split into an EquipmentTablePage per page.
+
+    The story holds one of these whatever the row count; each split hands
+    the frame a page that fits, then a page break and the rest as a smaller table.
+    """
+    
+    def __init__(self, rows, start, count, flags, on_drawn=None):
+        super().__init__()
+        self.rows = rows
+        self.start = start
+        self.count = count
+        self.flags = flags
+        self.on_drawn = on_drawn
+        self.width = sum(EQUIPMENT_COLUMN_WIDTHS)
+    
+    def wrap(self, availWidth, availHeight):
+        return self.width, EquipmentTablePage.HEADER_HEIGHT + self.count * EquipmentTablePage.ROW_HEIGHT
+    
+    def split(self, availWidth, availHeight):
+        fits = int((availHeight - EquipmentTablePage.HEADER_HEIGHT) // EquipmentTablePage.ROW_HEIGHT)
+        count = min(fits, FULL_REPORT_ROWS_PER_PAGE, self.count)
+        if count <= 0:
+            return []
+        page = EquipmentTablePage(self.rows, self.start, count, self.flags, self.on_drawn)
+        if count == self.count:
+            return [page]
+        rest = EquipmentTable(self.rows, self.start + count, self.count - count, self.flags, self.on_drawn)
+        # One table per page, even when a few more rows would fit below it
+        return [page, PageBreak(), rest]
+    
+    def draw(self):
+        # Only reached when every remaining row fits in the frame
+        EquipmentTablePage(self.rows, self.start, self.count, self.flags, self.on_drawn).drawOn(self.canv, 0, 0)
+
+
+def equipment_rows(dataset):
+    """Every equipment row as a tuple in EQUIPMENT_COLUMNS and upload order, read block by block"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return store_rows(store, EQUIPMENT_COLUMNS)
+    return queryset_rows(dataset.equipment.order_by('id'), EQUIPMENT_COLUMNS)
+
+
+def render_full_pdf_report(dataset, pdf_filename, progress=None):
+    """Generate a PDF report listing every equipment row, in page-sized tables.
+
+    Rows and flagged cells are streamed from the column store (or Equipment
+    table) and the anomalies as pages are drawn, and StreamingCanvas writes
+    each page out when it is finished, so memory does not grow with the row
+    count. progress(rows_done) is called every FULL_REPORT_PROGRESS_PAGES pages.
+    """
+    doc = SimpleDocTemplate(pdf_filename, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = summary_story(dataset, styles)
+    story.append(PageBreak())
+    story.append(Paragraph(f"<b>Equipment Details (All {dataset.total_count} Items)</b>", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+    
+    done = {'rows': 0, 'pages': 0}
+    
+    def on_drawn(count):
+        done['rows'] += count
+        done['pages'] += 1
+        if progress and done['pages'] % FULL_REPORT_PROGRESS_PAGES == 0:
+            progress(done['rows'])
+    
+    if dataset.total_count:
+        flags = RowFlags(iter_flagged_cells(dataset))
+        story.append(EquipmentTable(equipment_rows(dataset), 0, dataset.total_count, flags, on_drawn))
+    
+    doc.build(story, canvasmaker=StreamingCanvas)
+    if progress:
+        progress(done['rows'])
+    return pdf_filename
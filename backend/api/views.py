@@ -1,16 +1,35 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
-from django.http import FileResponse
-from django.db.models import Count
-import pandas as pd
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
 import os
-from .models import Dataset, Equipment
-from .serializers import UserSerializer, DatasetSerializer, DatasetListSerializer, EquipmentSerializer
-from .utils import generate_pdf_report
+from .models import Dataset, Equipment, Job, UploadSession
+from .serializers import UserSerializer, DatasetDetailSerializer, DatasetListSerializer, EquipmentSerializer, AnomalySerializer, JobSerializer, UploadSessionSerializer
+from .utils import REPORT_TEMPLATE_VERSION, generate_pdf_report, find_full_pdf_report
+from .ingest import save_upload, create_dataset_from_file, append_csv, remove_upload_if_unused
+from .retention import schedule_retention
+from .jobs import enqueue, enqueue_full_report, enqueue_refresh
+from .columnar import ColumnStore, get_type_distribution, equipment_records, remove_store_if_unused
+from .reports import remove_reports
+from .schema import rejections_path, remove_rejections, REJECTION_COLUMNS
+from .statistics import get_statistics
+from .anomalies import get_anomaly_count
+from .series import build_series
+from .comparison import parse_dataset_ids, compare_datasets
+from .pagination import EquipmentCursorPagination, AnomalyCursorPagination, ColumnStorePagination
+from .filters import FILTER_PARAMS, filter_equipment, filter_anomalies, equipment_ordering
+from .renderers import NDJSONRenderer, CSVRenderer, ColumnarRenderer
+from .streaming import stream_equipment, queryset_rows, store_rows
+from .bulk import EQUIPMENT_COLUMNS
+from .wire import ColumnarFrame, dataset_frame
+from .caching import conditional_dataset
+from .uploads import RangeError, SizeMismatchError, parse_content_range, start_session, write_range, complete_session, discard_session
 
 
 @api_view(['POST'])
@@ -23,18 +42,121 @@ def register(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def ingest_saved_file(request, name, file_path, content_hash):
+    """Turn a CSV already on disk into a Dataset, in the background when ?mode=async"""
+    if request.query_params.get('mode') == 'async':
+        job = enqueue(
+            request.user, Job.KIND_INGEST, name=name, file_path=file_path, content_hash=content_hash
+        )
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
+    try:
+        dataset = create_dataset_from_file(request.user, name, file_path, content_hash)
+    except Exception:
+        remove_upload_if_unused(file_path)
+        raise
+    
+    # Older datasets past the retention limits are deleted in the background
+    schedule_retention(request.user)
+    
+    # Don't echo every row back; clients fetch equipment separately
+    serializer = DatasetDetailSerializer(dataset)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+DATASET_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarRenderer]
+EQUIPMENT_RENDERERS = DATASET_RENDERERS + [NDJSONRenderer, CSVRenderer]
+
+
 class DatasetViewSet(viewsets.ModelViewSet):
-    serializer_class = DatasetSerializer
+    serializer_class = DatasetDetailSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
+    renderer_classes = DATASET_RENDERERS
     
     def get_queryset(self):
-        return Dataset.objects.filter(user=self.request.user)
+        # Datasets still being ingested in the background stay hidden until their job finishes
+        # Sketches are only read when statistics are rebuilt; keep them out of every other query
+        return Dataset.objects.ready().filter(user=self.request.user).defer('sketches')
+    
+    def get_object(self):
+        # Conditional-request checks and the action itself share one lookup
+        if not hasattr(self, '_dataset'):
+            self._dataset = super().get_object()
+        return self._dataset
     
     def get_serializer_class(self):
         if self.action == 'list':
             return DatasetListSerializer
-        return DatasetSerializer
+        if self.action == 'equipment':
+            return EquipmentSerializer
+        return DatasetDetailSerializer
+    
+    def perform_destroy(self, instance):
+        dataset_id = instance.id
+        instance.delete()
+        remove_upload_if_unused(instance.file_path)
+        remove_store_if_unused(instance.columns_path)
+        remove_reports(dataset_id)
+        remove_rejections(dataset_id)
+    
+    @conditional_dataset
+    def retrieve(self, request, *args, **kwargs):
+        dataset = self.get_object()
+        data = DatasetDetailSerializer(dataset).data
+        # Accept: application/vnd.equipment.columnar returns the stats plus every row as packed columns
+        if request.accepted_renderer.format == 'columnar':
+            return Response(dataset_frame(dataset, data))
+        # Rows are paged through /equipment/; ?include=equipment embeds them all, from the column store
+        if request.query_params.get('include') == 'equipment':
+            data['equipment'] = equipment_records(dataset)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'], renderer_classes=EQUIPMENT_RENDERERS)
+    @conditional_dataset
+    def equipment(self, request, pk=None):
+        dataset = self.get_object()
+        params = request.query_params
+        # Accept: application/x-ndjson / text/csv (or ?format=) streams every matching row instead of a page
+        stream_format = request.accepted_renderer.format
+        if stream_format not in ('ndjson', 'csv'):
+            stream_format = None
+        export_name = f'{os.path.splitext(dataset.name)[0]}_equipment'
+        
+        store = ColumnStore.for_dataset(dataset)
+        filtered = any(key in params for key in FILTER_PARAMS)
+        if filtered and store is not None and not settings.STORE_EQUIPMENT_ROWS:
+            return Response(
+                {'error': 'Filtering and sorting need the Equipment table (STORE_EQUIPMENT_ROWS)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # The columnar format carries every matching row at once; it is compact enough not to page
+        if request.accepted_renderer.format == 'columnar':
+            if store is not None and not filtered:
+                return Response(ColumnarFrame.from_store(store, {'dataset': dataset.id}))
+            queryset = filter_equipment(dataset.equipment.all(), params).order_by(*equipment_ordering(params))
+            rows = queryset_rows(queryset, EQUIPMENT_COLUMNS)
+            return Response(ColumnarFrame.from_rows(rows, {'dataset': dataset.id}))
+        
+        if store is not None and not settings.STORE_EQUIPMENT_ROWS:
+            if stream_format:
+                return stream_equipment(store_rows(store), stream_format, export_name)
+            paginator = ColumnStorePagination()
+            page = paginator.paginate_store(store, request)
+            return paginator.get_paginated_response(page)
+        
+        ordering = equipment_ordering(params)
+        queryset = filter_equipment(dataset.equipment.all(), params)
+        if stream_format:
+            rows = queryset_rows(queryset.order_by(*ordering))
+            return stream_equipment(rows, stream_format, export_name)
+        
+        paginator = EquipmentCursorPagination()
+        paginator.ordering = ordering
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = EquipmentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['post'])
     def upload(self, request):
@@ -46,90 +168,54 @@ class DatasetViewSet(viewsets.ModelViewSet):
             return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Read CSV
-            df = pd.read_csv(file)
-            
-            # Validate columns
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return Response(
-                    {'error': f'Missing required columns: {", ".join(missing_columns)}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Clean data
-            df = df.dropna()
-            
-            # Calculate statistics
-            stats = {
-                'total_count': len(df),
-                'avg_flowrate': float(df['Flowrate'].mean()),
-                'avg_pressure': float(df['Pressure'].mean()),
-                'avg_temperature': float(df['Temperature'].mean()),
-                'min_flowrate': float(df['Flowrate'].min()),
-                'max_flowrate': float(df['Flowrate'].max()),
-                'min_pressure': float(df['Pressure'].min()),
-                'max_pressure': float(df['Pressure'].max()),
-                'min_temperature': float(df['Temperature'].min()),
-                'max_temperature': float(df['Temperature'].max()),
-            }
-            
-            # Save file
-            upload_dir = 'media/uploads'
-            os.makedirs(upload_dir, exist_ok=True)
-            file_path = os.path.join(upload_dir, file.name)
-            
-            with open(file_path, 'wb+') as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
-            
-            # Create dataset
-            dataset = Dataset.objects.create(
-                user=request.user,
-                name=file.name,
-                file_path=file_path,
-                **stats
-            )
-            
-            # Create equipment records
-            equipment_list = []
-            for _, row in df.iterrows():
-                equipment_list.append(Equipment(
-                    dataset=dataset,
-                    equipment_name=row['Equipment Name'],
-                    equipment_type=row['Type'],
-                    flowrate=row['Flowrate'],
-                    pressure=row['Pressure'],
-                    temperature=row['Temperature']
-                ))
-            Equipment.objects.bulk_create(equipment_list)
-            
-            # Keep only last 5 datasets
-            user_datasets = Dataset.objects.filter(user=request.user).order_by('-uploaded_at')
-            if user_datasets.count() > 5:
-                old_datasets = user_datasets[5:]
-                for old_dataset in old_datasets:
-                    if os.path.exists(old_dataset.file_path):
-                        os.remove(old_dataset.file_path)
-                    old_dataset.delete()
-            
-            serializer = DatasetSerializer(dataset)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
+            # Save file, then ingest it in bounded chunks
+            file_path, content_hash = save_upload(file)
+            return ingest_saved_file(request, file.name, file_path, content_hash)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        dataset = self.get_object()
+        file = request.FILES.get('file')
+        if not file:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not file.name.endswith('.csv'):
+            return Response({'error': 'File must be a CSV'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Only the new rows are parsed; the dataset's aggregates are updated from their stored running values
+        file_path, _ = save_upload(file)
+        try:
+            dataset, added = append_csv(dataset.id, file_path, file.name)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            remove_upload_if_unused(file_path)
+        
+        # Cached reports describe the rows before the append; statistics and anomalies are rebuilt in the background
+        remove_reports(dataset.id)
+        enqueue_refresh(request.user, dataset)
+        return Response({**DatasetDetailSerializer(dataset).data, 'appended': added})
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        # ?ids=3,5,8; every list in the response lines up with 'datasets'
+        ids = parse_dataset_ids(request.query_params.get('ids'))
+        return Response(compare_datasets(self.get_queryset(), ids))
+    
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)')
+    def job_status(self, request, job_id=None):
+        job = get_object_or_404(Job, pk=job_id, user=request.user)
+        return Response(JobSerializer(job).data)
+    
     @action(detail=True, methods=['get'])
+    @conditional_dataset
     def summary(self, request, pk=None):
         dataset = self.get_object()
         
-        # Get type distribution
-        type_distribution = list(
-            dataset.equipment.values('equipment_type')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
+        # Stored at ingestion, so this is answered from the dataset row alone
+        type_distribution = get_type_distribution(dataset)
         
         return Response({
             'id': dataset.id,
@@ -157,13 +243,122 @@ class DatasetViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['get'])
+    @conditional_dataset
+    def statistics(self, request, pk=None):
+        dataset = self.get_object()
+        # Computed once at ingestion: std, percentiles, histograms and per-type figures
+        return Response({'id': dataset.id, 'total_count': dataset.total_count, **get_statistics(dataset)})
+    
+    @action(detail=True, methods=['get'])
+    @conditional_dataset
+    def anomalies(self, request, pk=None):
+        dataset = self.get_object()
+        # Flagged at ingestion and read through the (dataset, id) index, so only flagged rows are touched
+        get_anomaly_count(dataset)
+        queryset = filter_anomalies(dataset.anomalies.all(), request.query_params)
+        paginator = AnomalyCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = AnomalySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    @conditional_dataset
+    def series(self, request, pk=None):
+        # ?kind=histogram|density|lttb, reduced server-side to at most ?max_points= points
+        return Response(build_series(self.get_object(), request.query_params))
+    
+    @action(detail=True, methods=['get'])
+    @conditional_dataset
+    def rejections(self, request, pk=None):
+        # Rows the upload schema skipped: file, row, column, value and reason per bad value, as CSV
+        dataset = self.get_object()
+        filename = f'{os.path.splitext(dataset.name)[0]}_rejections.csv'
+        path = rejections_path(dataset.id)
+        if os.path.exists(path):
+            response = FileResponse(open(path, 'rb'), content_type='text/csv; charset=utf-8')
+        else:
+            response = HttpResponse(','.join(REJECTION_COLUMNS) + '\r\n', content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=True, methods=['get'])
+    @conditional_dataset(version=REPORT_TEMPLATE_VERSION)
     def download_pdf(self, request, pk=None):
         dataset = self.get_object()
         
         try:
-            pdf_path = generate_pdf_report(dataset)
+            # ?mode=full lists every row; it renders in the background and is polled via jobs/<id>/
+            if request.query_params.get('mode') == 'full':
+                pdf_path = find_full_pdf_report(dataset)
+                if pdf_path is None:
+                    job = enqueue_full_report(request.user, dataset)
+                    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+                filename = f'{dataset.name}_full_report.pdf'
+            else:
+                pdf_path = generate_pdf_report(dataset)
+                filename = f'{dataset.name}_report.pdf'
             response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{dataset.name}_report.pdf"'
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
             return response
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Resumable uploads: create a session, PUT byte ranges, then finalize into a Dataset"""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = start_session(self.request.user, data['filename'], data['size'])
+    
+    def perform_destroy(self, instance):
+        discard_session(instance)
+    
+    def update(self, request, pk=None):
+        session = self.get_object()
+        
+        # Body is raw bytes described by Content-Range; it is read straight from the socket
+        if request.stream is None:
+            return Response(
+                {'error': 'Empty chunk', 'offset': session.offset},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, length, total = parse_content_range(request.headers.get('Content-Range'))
+            write_range(session, start, length, request.stream, total)
+        except SizeMismatchError as e:
+            return Response({'error': str(e), 'offset': session.offset}, status=status.HTTP_400_BAD_REQUEST)
+        except RangeError as e:
+            return Response(
+                {'error': str(e), 'offset': session.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        except OSError as e:
+            return Response(
+                {'error': f'Could not store the chunk: {e.strerror or e}', 'offset': session.offset},
+                status=status.HTTP_507_INSUFFICIENT_STORAGE
+            )
+        return Response(self.get_serializer(session).data)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        
+        try:
+            file_path, content_hash = complete_session(session)
+        except RangeError as e:
+            return Response(
+                {'error': str(e), 'offset': session.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            return ingest_saved_file(request, session.filename, file_path, content_hash)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,117 @@
+"""Binary columnar payloads for dataset and equipment responses.
+
+Layout (all integers little-endian):
+
+    8 bytes   magic b'EQCOL1\\0\\0'
+    4 bytes   uint32 header length
+    header    UTF-8 JSON: {"rows", "meta", "types", "columns": [{"name", "dtype", "offset", "length"}]}
+    padding   zero bytes up to an 8-byte boundary
+    buffers   each column's raw bytes at its offset (relative to the end of the padding)
+
+Columns are flowrate/pressure/temperature (<f8), type_codes (<i4, indexes
+into "types"), name_offsets (<i8, rows + 1 entries) and names (UTF-8 bytes),
+so clients can wrap every buffer with numpy.frombuffer without per-row parsing.
+"""
+import json
+import struct
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from .bulk import EQUIPMENT_COLUMNS
+from .columnar import ColumnStore, NUMERIC_COLUMNS, NUMERIC_DTYPE, TYPE_CODE_DTYPE, NAME_OFFSET_DTYPE
+
+
+MAGIC = b'EQCOL1\x00\x00'
+MEDIA_TYPE = 'application/vnd.equipment.columnar'
+ALIGNMENT = 8
+
+
+class ColumnarFrame:
+    """Equipment columns (plus JSON metadata) ready to be encoded"""
+
+    def __init__(self, numeric, type_codes, types, name_offsets, names, meta=None):
+        self.numeric = numeric
+        self.type_codes = type_codes
+        self.types = types
+        self.name_offsets = name_offsets
+        self.names = names
+        self.meta = meta or {}
+
+    @property
+    def rows(self):
+        return len(self.type_codes)
+
+    @classmethod
+    def from_store(cls, store, meta=None):
+        """Wrap a column store's memory maps; nothing is copied until encode()"""
+        return cls(
+            numeric={column: store.column(column) for column in NUMERIC_COLUMNS},
+            type_codes=store.type_codes,
+            types=store.types,
+            name_offsets=store.name_offsets if store.rows else np.zeros(1, dtype=NAME_OFFSET_DTYPE),
+            names=store.name_bytes,
+            meta=meta,
+        )
+
+    @classmethod
+    def from_rows(cls, rows, meta=None):
+        """Build columns from tuples in EQUIPMENT_COLUMNS order (e.g. a filtered queryset)"""
+        frame = pd.DataFrame.from_records(rows, columns=EQUIPMENT_COLUMNS)
+        codes, types = pd.factorize(frame['equipment_type'], sort=False)
+        encoded = [name.encode('utf-8') for name in frame['equipment_name']]
+        lengths = np.fromiter((len(name) for name in encoded), dtype=NAME_OFFSET_DTYPE, count=len(encoded))
+        return cls(
+            numeric={column: frame[column].to_numpy(dtype=NUMERIC_DTYPE) for column in NUMERIC_COLUMNS},
+            type_codes=codes.astype(TYPE_CODE_DTYPE),
+            types=[str(t) for t in types],
+            name_offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(NAME_OFFSET_DTYPE),
+            names=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            meta=meta,
+        )
+
+
+def _pad(length):
+    return (-length) % ALIGNMENT
+
+
+def encode(frame=None, meta=None):
+    """Serialize a ColumnarFrame; with no frame, a header-only payload carrying meta (e.g. an error)"""
+    buffers = []
+    if frame is not None:
+        meta = frame.meta
+        buffers = [(column, NUMERIC_DTYPE, frame.numeric[column]) for column in NUMERIC_COLUMNS]
+        buffers += [
+            ('type_codes', TYPE_CODE_DTYPE, frame.type_codes),
+            ('name_offsets', NAME_OFFSET_DTYPE, frame.name_offsets),
+            ('names', '|u1', frame.names),
+        ]
+
+    columns = []
+    parts = []
+    offset = 0
+    for name, dtype, array in buffers:
+        data = memoryview(np.ascontiguousarray(array, dtype=dtype)).cast('B')
+        columns.append({'name': name, 'dtype': dtype, 'offset': offset, 'length': len(data)})
+        parts.append(data)
+        padding = _pad(len(data))
+        if padding:
+            parts.append(b'\x00' * padding)
+        offset += len(data) + padding
+
+    header = json.dumps({
+        'rows': frame.rows if frame is not None else 0,
+        'meta': meta or {},
+        'types': frame.types if frame is not None else [],
+        'columns': columns,
+    }, default=str).encode('utf-8')
+    prefix = MAGIC + struct.pack('<I', len(header)) + header
+    return b''.join([prefix, b'\x00' * _pad(len(prefix))] + parts)
+
+
+def dataset_frame(dataset, meta=None):
+    """Every row of a dataset, from its column store when it has one"""
+    store = ColumnStore.for_dataset(dataset)
+    if store is not None:
+        return ColumnarFrame.from_store(store, meta)
+    rows = dataset.equipment.order_by('id').values_list(*EQUIPMENT_COLUMNS)
+    return ColumnarFrame.from_rows(rows.iterator(chunk_size=settings.EQUIPMENT_STREAM_CHUNK_SIZE), meta)
@@ -0,0 +1,94 @@
+"""Rows per second for CSV parsing, the schema path against the old pd.read_csv path.
+
+Run from backend/:
+
+    python -m benchmarks.bench_parse
+    python -m benchmarks.bench_parse --sizes 100000 1000000 --bad-fraction 0.01
+
+Each size is written to a temporary CSV and parsed with:
+
+- legacy: the old read_csv_chunks (pandas guesses numeric dtypes, then dropna() and to_numeric()).
+- schema-c: api.schema with pandas' C parser.
+- schema-pyarrow: api.schema with pyarrow's streaming reader (only when pyarrow is installed).
+
+--bad-fraction replaces that share of Flowrate values with text. The legacy
+path fails on those files, so it is reported as 'error'.
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from .common import setup_django, make_frame, write_csv
+
+
+def parse_legacy(path, chunk_size):
+    from api.ingest import REQUIRED_COLUMNS, COLUMN_MAP, PARAMETERS
+
+    rows = 0
+    reader = pd.read_csv(
+        path, usecols=REQUIRED_COLUMNS, dtype={'Equipment Name': str, 'Type': str}, chunksize=chunk_size
+    )
+    for chunk in reader:
+        chunk = chunk.dropna().rename(columns=COLUMN_MAP)
+        for param in PARAMETERS:
+            chunk[param] = pd.to_numeric(chunk[param])
+        rows += len(chunk)
+    return rows
+
+
+def parse_schema(engine):
+    def parse(path, chunk_size):
+        from api.schema import read_raw_chunks, coerce_chunk
+
+        rows = 0
+        seen = 0
+        for raw in read_raw_chunks(path, chunk_size, engine=engine):
+            chunk, _ = coerce_chunk(raw, seen)
+            seen += len(raw)
+            rows += len(chunk)
+        return rows
+    return parse
+
+
+def run(sizes, chunk_size, bad_fraction):
+    from api.schema import pa_csv
+
+    paths = [('legacy', parse_legacy), ('schema-c', parse_schema('c'))]
+    if pa_csv is not None:
+        paths.append(('schema-pyarrow', parse_schema('pyarrow')))
+    else:
+        print('pyarrow is not installed; skipping schema-pyarrow')
+
+    directory = tempfile.mkdtemp(prefix='bench_parse_')
+    print(f'{"rows":>10} {"path":>15} {"seconds":>9} {"rows/s":>12} {"kept":>10}')
+    for rows in sizes:
+        path = os.path.join(directory, f'{rows}.csv')
+        write_csv(path, make_frame(rows), bad_fraction)
+        for label, parse in paths:
+            started = time.perf_counter()
+            try:
+                kept = parse(path, chunk_size)
+            except (ValueError, TypeError):
+                print(f'{rows:>10} {label:>15} {"error":>9}')
+                continue
+            elapsed = time.perf_counter() - started
+            print(f'{rows:>10} {label:>15} {elapsed:>9.2f} {rows / elapsed:>12,.0f} {kept:>10}')
+        os.remove(path)
+    os.rmdir(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--bad-fraction', type=float, default=0.0,
+                        help='share of Flowrate values replaced with text')
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.sizes, args.chunk_size, args.bad_fraction)
+
+
+if __name__ == '__main__':
+    main()
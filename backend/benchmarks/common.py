@@ -0,0 +1,88 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+BASE_TYPES = ['Pump', 'Reactor', 'Heat Exchanger', 'Compressor', 'Valve']
+# Parameter -> (mean, standard deviation) of the generated values
+PARAMETER_SCALES = {
+    'flowrate': (150, 30),
+    'pressure': (20, 5),
+    'temperature': (120, 25),
+}
+DISTRIBUTIONS = ['normal', 'uniform', 'lognormal']
+# Equipment field -> CSV header
+CSV_HEADERS = {
+    'equipment_name': 'Equipment Name',
+    'equipment_type': 'Type',
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+}
+
+
+def setup_django():
+    """Configure Django against DATABASE_URL, or a throwaway SQLite file, and migrate it"""
+    if 'DATABASE_URL' not in os.environ:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.sqlite3')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    from django.core.management import call_command
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def type_names(count):
+    """count equipment type names, the common ones first"""
+    return BASE_TYPES[:count] + [f'Type-{i}' for i in range(len(BASE_TYPES) + 1, count + 1)]
+
+
+def sample_values(rng, distribution, mean, std, rows):
+    if distribution == 'normal':
+        return rng.normal(mean, std, rows)
+    if distribution == 'uniform':
+        # Same mean and standard deviation as the normal case
+        half_width = std * np.sqrt(3)
+        return rng.uniform(mean - half_width, mean + half_width, rows)
+    if distribution == 'lognormal':
+        # Right-skewed, with the same mean and standard deviation
+        sigma = np.sqrt(np.log1p((std / mean) ** 2))
+        return rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, rows)
+    raise ValueError(f'Unknown distribution {distribution!r}; expected one of {", ".join(DISTRIBUTIONS)}')
+
+
+def make_frame(rows, seed=0, types=len(BASE_TYPES), distribution='normal', type_skew=0.0):
+    """Random equipment rows with Equipment field names as columns.
+
+    types sets how many distinct equipment types appear. With type_skew > 0
+    type i is picked with weight 1 / i**type_skew (Zipf-like), otherwise
+    uniformly. distribution shapes the three parameters.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(type_names(types))
+    if type_skew:
+        weights = 1 / np.arange(1, types + 1) ** type_skew
+        codes = rng.choice(types, size=rows, p=weights / weights.sum())
+    else:
+        codes = rng.integers(0, types, rows)
+    frame = pd.DataFrame({
+        'equipment_name': [f'EQ-{i}' for i in range(rows)],
+        'equipment_type': names[codes],
+    })
+    for param, (mean, std) in PARAMETER_SCALES.items():
+        frame[param] = sample_values(rng, distribution, mean, std, rows).round(2)
+    return frame
+
+
+def write_csv(path, frame, bad_fraction=0.0, seed=0):
+    """Write frame as an upload CSV; bad_fraction of its Flowrate values are replaced with text"""
+    frame = frame.rename(columns=CSV_HEADERS)
+    if bad_fraction:
+        rng = np.random.default_rng(seed)
+        bad = rng.random(len(frame)) < bad_fraction
+        frame['Flowrate'] = frame['Flowrate'].astype(object)
+        frame.loc[bad, 'Flowrate'] = 'n/a?'
+    frame.to_csv(path, index=False)
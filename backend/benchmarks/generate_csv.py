@@ -0,0 +1,36 @@
+"""Write a synthetic equipment CSV in the upload format.
+
+Run from backend/:
+
+    python -m benchmarks.generate_csv equipment.csv --rows 1000000
+    python -m benchmarks.generate_csv skewed.csv --rows 100000 --types 50 --type-skew 1.2 --distribution lognormal
+
+--types sets the number of distinct equipment types and --type-skew how
+unevenly rows are spread over them (0 is uniform). --distribution shapes
+Flowrate, Pressure and Temperature, and --bad-fraction replaces that share
+of Flowrate values with text, for exercising the upload schema's rejections.
+"""
+import argparse
+from .common import BASE_TYPES, DISTRIBUTIONS, make_frame, write_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--types', type=int, default=len(BASE_TYPES), help='distinct equipment types')
+    parser.add_argument('--type-skew', type=float, default=0.0,
+                        help='Zipf exponent for how often each type appears; 0 spreads rows evenly')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='normal')
+    parser.add_argument('--bad-fraction', type=float, default=0.0,
+                        help='share of Flowrate values replaced with text')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows, args.seed, args.types, args.distribution, args.type_skew)
+    write_csv(args.path, frame, args.bad_fraction, args.seed)
+    print(f'Wrote {args.rows} rows, {frame["equipment_type"].nunique()} types, to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,9 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '.onrender.com']
 
+# Render terminates TLS and forwards plain HTTP; trust its X-Forwarded-Proto so absolute URLs (pagination cursors) keep https
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -25,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack; removes itself unless REQUEST_METRICS_ENABLED
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -85,6 +90,78 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# CSV ingestion
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '50000'))
+
+# Values always land in the per-dataset column store (media/columns); the Equipment table is an optional row index
+STORE_EQUIPMENT_ROWS = os.getenv('STORE_EQUIPMENT_ROWS', 'True') == 'True'
+# CSV parser: 'auto' uses pyarrow when it is installed, 'c' always uses pandas' C parser
+CSV_ENGINE = os.getenv('CSV_ENGINE', 'auto')
+# Rows with a missing or malformed value are skipped and listed in the rejection report;
+# an upload fails when more than this share of its rows is rejected
+INGEST_MAX_REJECTED_FRACTION = float(os.getenv('INGEST_MAX_REJECTED_FRACTION', '0.5'))
+
+# Equipment listing page sizes (?page_size= is capped at the maximum)
+EQUIPMENT_PAGE_SIZE = int(os.getenv('EQUIPMENT_PAGE_SIZE', '500'))
+EQUIPMENT_MAX_PAGE_SIZE = int(os.getenv('EQUIPMENT_MAX_PAGE_SIZE', '5000'))
+# Rows fetched per round trip (and written per chunk) when streaming NDJSON/CSV
+EQUIPMENT_STREAM_CHUNK_SIZE = int(os.getenv('EQUIPMENT_STREAM_CHUNK_SIZE', '2000'))
+
+# Background jobs: threads per process. Set to 0 and run `manage.py run_jobs` to process them elsewhere
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# A job still running this long after it started is taken to have died with its process and is queued again
+JOB_STALE_MINUTES = int(os.getenv('JOB_STALE_MINUTES', '60'))
+# How often each web process requeues stale jobs and picks up queued ones whose hand-off was lost on restart
+JOB_RECOVERY_INTERVAL_SECONDS = int(os.getenv('JOB_RECOVERY_INTERVAL_SECONDS', '300'))
+
+# Seconds clients may reuse a dataset response before revalidating it with If-None-Match
+DATASET_CACHE_MAX_AGE = int(os.getenv('DATASET_CACHE_MAX_AGE', '0'))
+
+# Bins in each parameter's stored histogram
+STATISTICS_HISTOGRAM_BINS = int(os.getenv('STATISTICS_HISTOGRAM_BINS', '20'))
+
+# Above this many rows, percentiles and medians come from the upload's quantile sketches
+# and other statistics are accumulated block by block, keeping memory flat. Up to here the
+# exact figures take one vectorized pass over the memory-mapped columns (about 8 MB per column per million rows)
+EXACT_STATISTICS_MAX_ROWS = int(os.getenv('EXACT_STATISTICS_MAX_ROWS', '2000000'))
+# Quantile sketch size (larger is more accurate) and how many types get their own sketches
+SKETCH_K = int(os.getenv('SKETCH_K', '200'))
+SKETCH_MAX_TYPES = int(os.getenv('SKETCH_MAX_TYPES', '50'))
+
+# /series/ payload size: points (or histogram bins, or density cells) returned by default and at most
+SERIES_DEFAULT_POINTS = int(os.getenv('SERIES_DEFAULT_POINTS', '1000'))
+SERIES_MAX_POINTS = int(os.getenv('SERIES_MAX_POINTS', '10000'))
+
+# Anomaly detection at ingestion, within each equipment type: |z| above the threshold, or outside
+# [Q1 - k * IQR, Q3 + k * IQR]. Types with fewer rows than the minimum are not checked
+ANOMALY_ZSCORE_THRESHOLD = float(os.getenv('ANOMALY_ZSCORE_THRESHOLD', '3.0'))
+ANOMALY_IQR_MULTIPLIER = float(os.getenv('ANOMALY_IQR_MULTIPLIER', '1.5'))
+ANOMALY_MIN_GROUP_SIZE = int(os.getenv('ANOMALY_MIN_GROUP_SIZE', '10'))
+
+# Datasets one /datasets/compare/ request may include
+COMPARE_MAX_DATASETS = int(os.getenv('COMPARE_MAX_DATASETS', '10'))
+
+# Retention, enforced after each upload by a background job (0 disables a limit; the newest dataset is always kept)
+RETENTION_MAX_DATASETS = int(os.getenv('RETENTION_MAX_DATASETS', '5'))
+RETENTION_MAX_AGE_DAYS = int(os.getenv('RETENTION_MAX_AGE_DAYS', '0'))
+RETENTION_MAX_BYTES_PER_USER = int(os.getenv('RETENTION_MAX_BYTES_PER_USER', '0'))
+# `manage.py gc_media` leaves temp files and unfinished upload sessions younger than this alone
+MEDIA_GC_GRACE_HOURS = int(os.getenv('MEDIA_GC_GRACE_HOURS', '24'))
+
+# Rendered PDF reports (media/reports) are evicted least recently used first past either limit
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+REPORT_CACHE_MAX_FILES = int(os.getenv('REPORT_CACHE_MAX_FILES', '200'))
+
+# Per-request timings: a Server-Timing header on every response and Prometheus metrics at /metrics.
+# The scrape endpoint requires `Authorization: Bearer <token>` when a token is set
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'False') == 'True'
+REQUEST_METRICS_TOKEN = os.getenv('REQUEST_METRICS_TOKEN', '')
+# Upper bounds, in seconds, of the per-route latency histogram buckets
+REQUEST_METRICS_BUCKETS = [
+    float(bound)
+    for bound in os.getenv('REQUEST_METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10').split(',')
+]
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
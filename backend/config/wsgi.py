@@ -3,3 +3,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 application = get_wsgi_application()
+
+# Resume background jobs left queued or running by a previous process
+from api.jobs import start_workers  # noqa: E402
+start_workers()
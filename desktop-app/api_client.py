@@ -1,12 +1,69 @@
+import json
+import os
+import struct
+import time
+import numpy as np
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 
 API_URL = 'http://localhost:8000/api'
 
+EQUIPMENT_PAGE_SIZE = 1000
+
+# Resumable uploads send the file in pieces of this size
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_RETRIES = 5
+# Files above this size go through the resumable upload API
+RESUMABLE_THRESHOLD = 16 * 1024 * 1024
+
+# Binary columnar payloads (see backend/api/wire.py)
+COLUMNAR_MEDIA_TYPE = 'application/vnd.equipment.columnar'
+COLUMNAR_MAGIC = b'EQCOL1\x00\x00'
+
+
+def decode_columnar(payload: bytes) -> Dict[str, Any]:
+    """Unpack a columnar payload into {'rows', 'meta', <column>: numpy array, ...}.
+
+    Numeric columns are zero-copy views of the payload; equipment_type and
+    equipment_name come back as numpy string arrays.
+    """
+    if payload[:len(COLUMNAR_MAGIC)] != COLUMNAR_MAGIC:
+        raise ValueError('Not a columnar payload')
+    start = len(COLUMNAR_MAGIC)
+    (header_length,) = struct.unpack_from('<I', payload, start)
+    start += 4
+    header = json.loads(payload[start:start + header_length].decode('utf-8'))
+    start += header_length
+    start += -start % 8
+
+    buffers = {
+        column['name']: np.frombuffer(
+            payload, dtype=column['dtype'], count=column['length'] // np.dtype(column['dtype']).itemsize,
+            offset=start + column['offset']
+        )
+        for column in header['columns']
+    }
+    result = {'rows': header['rows'], 'meta': header['meta']}
+    if not buffers:
+        return result
+
+    for name in ('flowrate', 'pressure', 'temperature'):
+        result[name] = buffers[name]
+    result['equipment_type'] = np.array(header['types'] or [''])[buffers['type_codes']]
+    names = buffers['names'].tobytes()
+    offsets = buffers['name_offsets'].tolist()
+    result['equipment_name'] = np.array(
+        [names[begin:end].decode('utf-8') for begin, end in zip(offsets[:-1], offsets[1:])]
+    )
+    return result
+
+
 class APIClient:
     def __init__(self):
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
+        # url -> (ETag, parsed body) for responses the server marks revalidatable
+        self._etag_cache: Dict[str, Any] = {}
     
     def _get_headers(self) -> Dict[str, str]:
         headers = {'Content-Type': 'application/json'}
@@ -38,17 +95,99 @@ class APIClient:
         response.raise_for_status()
         return response.json()
     
+    def _get_cached_json(self, url: str):
+        """GET with If-None-Match, reusing the cached body when the server answers 304"""
+        headers = self._get_headers()
+        cached = self._etag_cache.get(url)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+        data = response.json()
+        if response.headers.get('ETag'):
+            self._etag_cache[url] = (response.headers['ETag'], data)
+        return data
+    
     def get_dataset(self, dataset_id: int):
-        response = requests.get(f'{API_URL}/datasets/{dataset_id}/', headers=self._get_headers())
+        return self._get_cached_json(f'{API_URL}/datasets/{dataset_id}/')
+    
+    def get_dataset_columns(self, dataset_id: int):
+        """A dataset's stats (under 'meta') and every row as numpy columns, in one binary response"""
+        headers = self._auth_headers()
+        headers['Accept'] = COLUMNAR_MEDIA_TYPE
+        response = requests.get(f'{API_URL}/datasets/{dataset_id}/', headers=headers)
+        response.raise_for_status()
+        return decode_columnar(response.content)
+    
+    def get_equipment_columns(self, dataset_id: int, **filters):
+        """Every equipment row matching filters (type, flowrate_min, search, ...) as numpy columns"""
+        headers = self._auth_headers()
+        headers['Accept'] = COLUMNAR_MEDIA_TYPE
+        response = requests.get(
+            f'{API_URL}/datasets/{dataset_id}/equipment/', params=filters, headers=headers
+        )
+        response.raise_for_status()
+        return decode_columnar(response.content)
+    
+    def get_equipment(self, dataset_id: int, cursor: Optional[str] = None, page_size: int = EQUIPMENT_PAGE_SIZE):
+        """One page of equipment rows: {'next', 'previous', 'results'}"""
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        response = requests.get(
+            f'{API_URL}/datasets/{dataset_id}/equipment/',
+            params=params,
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def get_next_equipment(self, next_url: str):
+        response = requests.get(next_url, headers=self._get_headers())
         response.raise_for_status()
         return response.json()
     
     def get_summary(self, dataset_id: int):
-        response = requests.get(f'{API_URL}/datasets/{dataset_id}/summary/', headers=self._get_headers())
+        return self._get_cached_json(f'{API_URL}/datasets/{dataset_id}/summary/')
+    
+    def get_statistics(self, dataset_id: int):
+        return self._get_cached_json(f'{API_URL}/datasets/{dataset_id}/statistics/')
+    
+    def get_anomalies(self, dataset_id: int, **filters):
+        """First page of flagged values; filters are parameter=, method=, type="""
+        response = requests.get(
+            f'{API_URL}/datasets/{dataset_id}/anomalies/',
+            params=filters,
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def compare_datasets(self, dataset_ids):
+        """Per-parameter and per-type aggregates of several datasets, side by side in dataset_ids order"""
+        response = requests.get(
+            f'{API_URL}/datasets/compare/',
+            params={'ids': ','.join(str(i) for i in dataset_ids)},
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def get_series(self, dataset_id: int, kind: str = 'histogram', **params):
+        """Chart-ready reduced data: kind is 'histogram', 'density' or 'lttb'; see the API docs for params"""
+        response = requests.get(
+            f'{API_URL}/datasets/{dataset_id}/series/',
+            params={'kind': kind, **params},
+            headers=self._get_headers()
+        )
         response.raise_for_status()
         return response.json()
     
     def upload_dataset(self, file_path: str):
+        if os.path.getsize(file_path) > RESUMABLE_THRESHOLD:
+            return self.upload_dataset_resumable(file_path)
         with open(file_path, 'rb') as f:
             files = {'file': f}
             headers = {}
@@ -58,6 +197,65 @@ class APIClient:
             response.raise_for_status()
             return response.json()
     
+    def append_to_dataset(self, dataset_id: int, file_path: str):
+        with open(file_path, 'rb') as f:
+            response = requests.post(
+                f'{API_URL}/datasets/{dataset_id}/append/',
+                files={'file': f},
+                headers=self._auth_headers()
+            )
+        response.raise_for_status()
+        return response.json()
+    
+    def _auth_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        return headers
+    
+    def upload_dataset_resumable(self, file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                                 progress: Optional[Callable[[int, int], None]] = None):
+        """Upload a CSV in byte ranges, resuming from the server's offset after a dropped connection"""
+        size = os.path.getsize(file_path)
+        response = requests.post(
+            f'{API_URL}/uploads/',
+            json={'filename': os.path.basename(file_path), 'size': size},
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+        session = response.json()
+        session_url = f"{API_URL}/uploads/{session['id']}/"
+        
+        offset = session['offset']
+        retries = 0
+        with open(file_path, 'rb') as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+                headers = self._auth_headers()
+                headers['Content-Type'] = 'application/octet-stream'
+                headers['Content-Range'] = f'bytes {offset}-{offset + len(chunk) - 1}/{size}'
+                try:
+                    response = requests.put(session_url, data=chunk, headers=headers)
+                    if response.status_code != 409:
+                        response.raise_for_status()
+                    offset = response.json()['offset']
+                    retries = 0
+                except requests.ConnectionError:
+                    retries += 1
+                    if retries > UPLOAD_MAX_RETRIES:
+                        raise
+                    # Ask the server how much actually arrived and carry on from there
+                    response = requests.get(session_url, headers=self._get_headers())
+                    response.raise_for_status()
+                    offset = response.json()['offset']
+                if progress:
+                    progress(offset, size)
+        
+        response = requests.post(f'{session_url}finalize/', headers=self._get_headers())
+        response.raise_for_status()
+        return response.json()
+    
     def download_pdf(self, dataset_id: int, save_path: str):
         response = requests.get(
             f'{API_URL}/datasets/{dataset_id}/download_pdf/',
@@ -69,6 +267,26 @@ class APIClient:
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
     
+    def download_full_pdf(self, dataset_id: int, save_path: str, poll_interval: float = 2.0):
+        """Download the report listing every row, waiting while the server renders it in the background"""
+        url = f'{API_URL}/datasets/{dataset_id}/download_pdf/'
+        while True:
+            response = requests.get(url, params={'mode': 'full'}, headers=self._get_headers(), stream=True)
+            response.raise_for_status()
+            if response.status_code != 202:
+                break
+            job = response.json()
+            while job['state'] in ('queued', 'running'):
+                time.sleep(poll_interval)
+                job = requests.get(f"{API_URL}/datasets/jobs/{job['id']}/", headers=self._get_headers()).json()
+            if job['state'] == 'failed':
+                raise RuntimeError(job['error'] or 'Report rendering failed')
+        with open(save_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+    
     def delete_dataset(self, dataset_id: int):
         response = requests.delete(f'{API_URL}/datasets/{dataset_id}/', headers=self._get_headers())
         response.raise_for_status()
+        prefix = f'{API_URL}/datasets/{dataset_id}/'
+        self._etag_cache = {url: entry for url, entry in self._etag_cache.items() if not url.startswith(prefix)}
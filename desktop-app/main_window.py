@@ -13,6 +13,8 @@ class MainWindow(QMainWindow):
         self.api_client = api_client
         self.current_dataset = None
         self.current_summary = None
+        self.current_equipment = []
+        self.equipment_next = None
         self.theme_manager = theme_manager or ThemeManager()
         self.init_ui()
         self.apply_theme()
@@ -102,6 +104,17 @@ class MainWindow(QMainWindow):
         self.equipment_table.horizontalHeader().setStretchLastSection(True)
         table_layout.addWidget(self.equipment_table)
         
+        # Rows arrive a cursor page at a time; the rest are fetched on demand
+        footer_layout = QHBoxLayout()
+        self.equipment_count_label = QLabel('')
+        footer_layout.addWidget(self.equipment_count_label)
+        footer_layout.addStretch()
+        self.load_more_btn = QPushButton('Load more')
+        self.load_more_btn.clicked.connect(self.load_more_equipment)
+        self.load_more_btn.setVisible(False)
+        footer_layout.addWidget(self.load_more_btn)
+        table_layout.addLayout(footer_layout)
+        
         table_group.setLayout(table_layout)
         main_layout.addWidget(table_group)
     
@@ -142,10 +155,33 @@ class MainWindow(QMainWindow):
         try:
             self.current_dataset = self.api_client.get_dataset(dataset_id)
             self.current_summary = self.api_client.get_summary(dataset_id)
+            # The first page of rows; 'Load more' follows the cursor for the rest
+            page = self.api_client.get_equipment(dataset_id)
+            self.current_equipment = page['results']
+            self.equipment_next = page['next']
             self.update_ui()
+            self.update_equipment_footer()
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Failed to load dataset: {str(e)}')
     
+    def load_more_equipment(self):
+        if not self.equipment_next:
+            return
+        
+        try:
+            page = self.api_client.get_next_equipment(self.equipment_next)
+            self.current_equipment.extend(page['results'])
+            self.equipment_next = page['next']
+            self.update_table()
+            self.update_equipment_footer()
+        except Exception as e:
+            QMessageBox.critical(self, 'Error', f'Failed to load more equipment: {str(e)}')
+    
+    def update_equipment_footer(self):
+        total = self.current_dataset['total_count'] if self.current_dataset else len(self.current_equipment)
+        self.equipment_count_label.setText(f'Showing {len(self.current_equipment)} of {total} items')
+        self.load_more_btn.setVisible(bool(self.equipment_next))
+    
     def update_ui(self):
         if not self.current_dataset or not self.current_summary:
             return
@@ -232,7 +268,7 @@ class MainWindow(QMainWindow):
         self.params_chart.draw()
     
     def update_table(self):
-        equipment = self.current_dataset['equipment']
+        equipment = self.current_equipment
         self.equipment_table.setRowCount(len(equipment))
         
         for i, eq in enumerate(equipment):
@@ -294,7 +330,7 @@ class MainWindow(QMainWindow):
         self.params_chart.draw()
     
     def update_table(self):
-        equipment = self.current_dataset['equipment']
+        equipment = self.current_equipment
         self.equipment_table.setRowCount(len(equipment))
         
         for i, eq in enumerate(equipment):
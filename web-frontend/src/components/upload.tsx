@@ -5,6 +5,9 @@ import { useRef, useState } from "react";
 import { toast } from "sonner";
 import { datasetAPI } from "@/lib/api";
 
+// Files above this size go through the resumable upload API
+const RESUMABLE_THRESHOLD = 16 * 1024 * 1024;
+
 interface UploadCSVProps {
   onUploadSuccess: () => void;  
 }
@@ -28,7 +31,11 @@ const Upload_CSV = ({onUploadSuccess}: UploadCSVProps) => {
 
     setUploading(true);
     try {
-      await datasetAPI.upload(file);
+      if (file.size > RESUMABLE_THRESHOLD) {
+        await datasetAPI.uploadResumable(file);
+      } else {
+        await datasetAPI.upload(file);
+      }
       toast.success('Dataset uploaded successfully');
       await onUploadSuccess();
     } catch (error: any) {
@@ -49,9 +49,50 @@ export const authAPI = {
     axios.post(`${API_URL}/auth/login/`, data),
 };
 
+// Resumable uploads send the file in pieces of this size
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+const uploadResumable = async (file: File, onProgress?: (sent: number, total: number) => void) => {
+  const { data: session } = await api.post('/uploads/', { filename: file.name, size: file.size });
+  let offset: number = session.offset;
+  let retries = 0;
+
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+    try {
+      const response = await api.put(`/uploads/${session.id}/`, chunk, {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${offset + chunk.size - 1}/${file.size}`,
+        },
+      });
+      offset = response.data.offset;
+      retries = 0;
+    } catch (error: any) {
+      // A 409 carries the offset the server expects; otherwise ask it how much arrived
+      if (error.response?.status === 409) {
+        offset = error.response.data.offset;
+      } else if (!error.response && retries < UPLOAD_MAX_RETRIES) {
+        retries += 1;
+        const { data } = await api.get(`/uploads/${session.id}/`);
+        offset = data.offset;
+      } else {
+        throw error;
+      }
+    }
+    onProgress?.(offset, file.size);
+  }
+
+  return api.post(`/uploads/${session.id}/finalize/`);
+};
+
 export const datasetAPI = {
   list: () => api.get('/datasets/'),
   get: (id: number) => api.get(`/datasets/${id}/`),
+  equipment: (id: number, params?: { cursor?: string; page_size?: number }) =>
+    api.get(`/datasets/${id}/equipment/`, { params }),
+  equipmentPage: (url: string) => api.get(url),
   upload: (file: File) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -59,8 +100,34 @@ export const datasetAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
     });
   },
+  uploadResumable,
+  append: (id: number, file: File) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post(`/datasets/${id}/append/`, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  },
   delete: (id: number) => api.delete(`/datasets/${id}/`),
   summary: (id: number) => api.get(`/datasets/${id}/summary/`),
+  statistics: (id: number) => api.get(`/datasets/${id}/statistics/`),
+  anomalies: (
+    id: number,
+    params?: { parameter?: string; method?: 'zscore' | 'iqr'; type?: string; cursor?: string; page_size?: number }
+  ) => api.get(`/datasets/${id}/anomalies/`, { params }),
+  compare: (ids: number[]) => api.get('/datasets/compare/', { params: { ids: ids.join(',') } }),
+  series: (
+    id: number,
+    params: {
+      kind: 'histogram' | 'density' | 'lttb';
+      parameter?: string;
+      x?: string;
+      y?: string;
+      bins?: number;
+      type?: string;
+      max_points?: number;
+    }
+  ) => api.get(`/datasets/${id}/series/`, { params }),
   downloadPDF: (id: number) => 
     api.get(`/datasets/${id}/download_pdf/`, { responseType: 'blob' }),
 };
@@ -54,9 +54,16 @@ interface DatasetDetail {
   max_pressure: number;
   min_temperature: number;
   max_temperature: number;
-  equipment: Equipment[];
 }
 
+interface EquipmentPage {
+  next: string | null;
+  previous: string | null;
+  results: Equipment[];
+}
+
+const EQUIPMENT_PAGE_SIZE = 1000;
+
 interface Summary {
   id: number;
   name: string;
@@ -74,6 +81,8 @@ export default function Dashboard() {
   const [datasets, setDatasets] = useState<Dataset[]>([]);
   const [selectedDataset, setSelectedDataset] = useState<DatasetDetail | null>(null);
   const [summary, setSummary] = useState<Summary | null>(null);
+  const [equipment, setEquipment] = useState<Equipment[]>([]);
+  const [nextEquipmentPage, setNextEquipmentPage] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const { theme } = useTheme();
 
@@ -96,12 +105,16 @@ export default function Dashboard() {
   const fetchDatasetDetails = async (id: number) => {
     setLoading(true);
     try {
-      const [detailResponse, summaryResponse] = await Promise.all([
+      const [detailResponse, summaryResponse, equipmentResponse] = await Promise.all([
         datasetAPI.get(id),
         datasetAPI.summary(id),
+        datasetAPI.equipment(id, { page_size: EQUIPMENT_PAGE_SIZE }),
       ]);
+      const page: EquipmentPage = equipmentResponse.data;
       setSelectedDataset(detailResponse.data);
       setSummary(summaryResponse.data);
+      setEquipment(page.results);
+      setNextEquipmentPage(page.next);
     } catch (error) {
       toast.error('Failed to fetch dataset details');
     } finally {
@@ -110,6 +123,17 @@ export default function Dashboard() {
   };
 
 
+  const loadMoreEquipment = async () => {
+    if (!nextEquipmentPage) return;
+    try {
+      const response = await datasetAPI.equipmentPage(nextEquipmentPage);
+      const page: EquipmentPage = response.data;
+      setEquipment((rows) => [...rows, ...page.results]);
+      setNextEquipmentPage(page.next);
+    } catch (error) {
+      toast.error('Failed to load more equipment');
+    }
+  };
 
   const handleDelete = async (id: number) => {
     if (!confirm('Are you sure you want to delete this dataset?')) return;
@@ -120,6 +144,8 @@ export default function Dashboard() {
       if (selectedDataset?.id === id) {
         setSelectedDataset(null);
         setSummary(null);
+        setEquipment([]);
+        setNextEquipmentPage(null);
       }
     } catch (error) {
       toast.error('Failed to delete dataset');
@@ -325,7 +351,7 @@ export default function Dashboard() {
               <CardHeader className="flex flex-row items-center justify-between">
                 <div>
                   <CardTitle>Equipment Details</CardTitle>
-                  <CardDescription>Showing {selectedDataset.equipment.length} items</CardDescription>
+                  <CardDescription>Showing {equipment.length} of {selectedDataset.total_count} items</CardDescription>
                 </div>
                 <Button onClick={handleDownloadPDF}>
                   <Download className="h-4 w-4 mr-2" />
@@ -333,7 +359,14 @@ export default function Dashboard() {
                 </Button>
               </CardHeader>
               <CardContent>
-                <EquipmentDataTable columns={columns} data={selectedDataset.equipment} />
+                <EquipmentDataTable columns={columns} data={equipment} />
+                {nextEquipmentPage && (
+                  <div className="flex justify-center mt-4">
+                    <Button variant="outline" onClick={loadMoreEquipment}>
+                      Load more
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </>